@@ -0,0 +1 @@
+"""Benchmarks of the polls application."""
@@ -0,0 +1,55 @@
+"""
+Compare the sync views under a WSGI server with the async views under an ASGI server.
+
+Runs ``manage.py bench`` twice on the same seeded data set, once over HTTP
+against the WSGI application with POLLS_ASYNC_VIEWS off and once over HTTP
+against the ASGI application served by uvicorn with it on, and prints the
+requests per second and p95 latency of both runs and their ratio as JSON.
+Neither side counts queries, so both run with the same overhead::
+
+    python -m benchmarks.asgi_vs_wsgi --requests 500 --concurrency 16
+
+Any other arguments are passed on to ``manage.py bench``.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def bench(transport, async_views, args):
+    """Run one ``manage.py bench`` and return its report."""
+    env = dict(os.environ, POLLS_ASYNC_VIEWS='true' if async_views else 'false')
+    command = [sys.executable, 'manage.py', 'bench', '--transport', transport, *args]
+    output = subprocess.run(command, cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def main():
+    """Run both benchmarks and print the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _, args = parser.parse_known_args()
+    wsgi = bench('wsgi', False, args)
+    asgi = bench('uvicorn', True, args)
+    options = {name: value for name, value in wsgi['options'].items() if name != 'transport'}
+    report = {}
+    for endpoint, sync_results in wsgi['endpoints'].items():
+        async_results = asgi['endpoints'][endpoint]
+        report[endpoint] = {
+            'wsgi_requests_per_second': sync_results['requests_per_second'],
+            'asgi_requests_per_second': async_results['requests_per_second'],
+            'asgi_speedup': (round(async_results['requests_per_second'] / sync_results['requests_per_second'], 2)
+                             if sync_results['requests_per_second'] else None),
+            'wsgi_p95_ms': sync_results['p95_ms'],
+            'asgi_p95_ms': async_results['p95_ms'],
+            'errors': sync_results['errors'] + async_results['errors'],
+        }
+    print(json.dumps({'commit': wsgi['commit'], 'options': options, 'endpoints': report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Instant-runoff tally of polls.tally with NumPy against its pure-Python reference.
+
+Generates random ranked ballots, packs them as the ``Ballot`` rows store
+them, and prints as JSON the best time of the NumPy count (decoding the
+packed ballots included) and of ``irv_python`` over the same ballots, with
+their ratio and whether both found the same rounds::
+
+    python -m benchmarks.irv --ballots 100000 --choices 8
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from polls import tally
+
+
+def make_ballots(count, choices, seed):
+    """Return ``count`` random rankings of some of ``choices`` choices, favouring the first ones."""
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, choices + 1)
+    weights /= weights.sum()
+    lengths = rng.integers(1, choices + 1, size=count)
+    return [rng.choice(choices, size=length, replace=False, p=weights).tolist() for length in lengths]
+
+
+def best(function, repeat):
+    """Return the result of ``function()`` and its fastest time in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    """Time both counts and print the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ballots', type=int, default=100000)
+    parser.add_argument('--choices', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rankings = make_ballots(args.ballots, args.choices, args.seed)
+    # Choice ids as the database would have them.
+    choice_ids = list(range(1000, 1000 + args.choices))
+    packed = [tally.pack(choice_ids[choice] for choice in ranking) for ranking in rankings]
+
+    vectorized, numpy_seconds = best(
+        lambda: tally.irv(tally.decode(packed, choice_ids), args.choices), args.repeat)
+    reference, python_seconds = best(lambda: tally.irv_python(rankings, args.choices), args.repeat)
+    print(json.dumps({
+        'options': vars(args),
+        'rounds': len(vectorized.rounds),
+        'same_result': vectorized == reference,
+        'numpy_seconds': round(numpy_seconds, 4),
+        'python_seconds': round(python_seconds, 4),
+        'speedup': round(python_seconds / numpy_seconds, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""Seed a scratch database and drive the polls endpoints under load."""
+import asyncio
+import datetime
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookies import SimpleCookie
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question, Vote
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+ENDPOINTS = ('index', 'detail', 'results', 'vote')
+
+logger = logging.getLogger(__name__)
+
+
+def seed(questions, choices, users, votes_per_user, batch_size=1000):
+    """
+    Fill the database with open questions, their choices, users and votes using bulk inserts.
+
+    Returns:
+        dict: The primary keys of the questions, the choice keys of every
+        question and the user keys.
+    """
+    now = timezone.now()
+    Question.objects.bulk_create([
+        Question(question_text='Question {}'.format(i), pub_date=now - datetime.timedelta(days=1, seconds=i),
+                 end_date=now + datetime.timedelta(days=30))
+        for i in range(questions)], batch_size=batch_size)
+    question_ids = list(Question.objects.order_by('pk').values_list('pk', flat=True))
+    Choice.objects.bulk_create([
+        Choice(question_id=question_id, choice_text='Choice {}'.format(i))
+        for question_id in question_ids for i in range(choices)], batch_size=batch_size)
+    choice_ids = {}
+    for pk, question_id in Choice.objects.values_list('pk', 'question_id'):
+        choice_ids.setdefault(question_id, []).append(pk)
+    password = make_password(None)
+    User.objects.bulk_create([User(username='bench{}'.format(i), password=password) for i in range(users)],
+                             batch_size=batch_size)
+    user_ids = list(User.objects.filter(username__startswith='bench').values_list('pk', flat=True))
+    Vote.objects.bulk_create([
+        Vote(question_id=question_id, user_id=user_id, choice_id=random.choice(choice_ids[question_id]))
+        for user_id in user_ids
+        for question_id in random.sample(question_ids, min(votes_per_user, len(question_ids)))],
+        batch_size=batch_size)
+    Question.objects.recount_votes()
+    return {'questions': question_ids, 'choices': choice_ids, 'users': user_ids}
+
+
+def percentile(sorted_values, fraction):
+    """Return the value below which ``fraction`` of the sorted values lie."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ClientTransport:
+    """Send requests through the Django test client, counting the queries of each one."""
+
+    counts_queries = True
+
+    def session(self, user_id):
+        """Return a client, logged in as the user if one is given."""
+        client = Client(raise_request_exception=False)
+        if user_id is not None:
+            client.force_login(User.objects.get(pk=user_id))
+        return client
+
+    def request(self, client, method, path, data=None):
+        """Send one request and return its status code and number of queries."""
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(path, data) if method == 'POST' else client.get(path)
+        return response.status_code, len(queries)
+
+    def close(self):
+        """Nothing to stop."""
+
+
+class HTTPTransport:
+    """Send requests over HTTP to a server the subclasses start on a local port."""
+
+    counts_queries = False
+
+    def __init__(self, port):
+        """Send the requests to ``port``."""
+        self.base = 'http://127.0.0.1:{}'.format(port)
+        self.opener = urllib.request.build_opener(_NoRedirect())
+
+    def session(self, user_id):
+        """Return the cookies of a session of the user, with a CSRF token, or of no session."""
+        cookies = SimpleCookie()
+        if user_id is not None:
+            client = Client()
+            client.force_login(User.objects.get(pk=user_id))
+            cookies['sessionid'] = client.cookies['sessionid'].value
+            with urllib.request.urlopen(self.base + reverse('polls:login')) as response:
+                cookies.load(response.headers['Set-Cookie'])
+        return cookies
+
+    def request(self, cookies, method, path, data=None):
+        """Send one request and return its status code; queries are not counted."""
+        headers = {'Cookie': '; '.join('{}={}'.format(name, morsel.value) for name, morsel in cookies.items())}
+        body = None
+        if method == 'POST':
+            headers['X-CSRFToken'] = cookies['csrftoken'].value if 'csrftoken' in cookies else ''
+            body = urllib.parse.urlencode(data or {}).encode()
+        request = urllib.request.Request(self.base + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request) as response:
+                return response.status, None
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+
+class WSGITransport(HTTPTransport):
+    """Send requests over HTTP to the WSGI application served on a local port."""
+
+    def __init__(self):
+        """Serve mysite's WSGI application from a background thread."""
+        self.server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                                  server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+        super().__init__(self.server.server_port)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class UvicornTransport(HTTPTransport):
+    """Send requests over HTTP to the ASGI application served by uvicorn on a local port."""
+
+    def __init__(self):
+        """Serve mysite's ASGI application with uvicorn from a background thread."""
+        self.server = uvicorn.Server(uvicorn.Config(get_asgi_application(), host='127.0.0.1', port=0,
+                                                    lifespan='off', log_level='warning'))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError('uvicorn did not start.')
+            time.sleep(0.01)
+        super().__init__(self.server.servers[0].sockets[0].getsockname()[1])
+
+    def close(self):
+        """Stop the server."""
+        self.server.should_exit = True
+        self.thread.join()
+
+
+class ASGITransport:
+    """
+    Send requests through the ASGI handler, all served by one event loop.
+
+    The worker threads only submit requests to the loop, so the requests
+    run concurrently the way an ASGI server runs them; queries are not
+    counted.
+    """
+
+    counts_queries = False
+
+    def __init__(self):
+        """Run an event loop in a background thread."""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def session(self, user_id):
+        """Return an async client, logged in as the user if one is given."""
+        client = AsyncClient(raise_request_exception=False)
+        if user_id is not None:
+            client.force_login(User.objects.get(pk=user_id))
+        return client
+
+    def request(self, client, method, path, data=None):
+        """Send one request and return its status code; queries are not counted."""
+        coroutine = client.post(path, data) if method == 'POST' else client.get(path)
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result().status_code, None
+
+    def close(self):
+        """Stop the event loop."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+TRANSPORTS = {'client': ClientTransport, 'wsgi': WSGITransport, 'asgi': ASGITransport, 'uvicorn': UvicornTransport}
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as they are instead of following them."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def drive(transport, endpoint, data, requests, concurrency):
+    """
+    Send ``requests`` requests to one endpoint from ``concurrency`` threads.
+
+    Returns:
+        dict: The latency percentiles in milliseconds (None if no request
+        got an answer), the requests per second, the mean number of
+        queries per request and the errors: error responses and requests
+        that raised.
+    """
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    def worker(count, user_id):
+        session = transport.session(user_id if endpoint == 'vote' else None)
+        mine_latencies, mine_queries, mine_errors = [], [], 0
+        for _ in range(count):
+            question_id = random.choice(data['questions'])
+            if endpoint == 'index':
+                method, path, form = 'GET', reverse('polls:index'), None
+            elif endpoint == 'vote':
+                method, path = 'POST', reverse('polls:vote', args=(question_id,))
+                form = {'choice': random.choice(data['choices'][question_id])}
+            else:
+                method, path, form = 'GET', reverse('polls:' + endpoint, args=(question_id,)), None
+            start = time.perf_counter()
+            try:
+                status, count_queries = transport.request(session, method, path, form)
+            except Exception:
+                logger.exception("{} {} failed.".format(method, path))
+                mine_errors += 1
+                continue
+            mine_latencies.append((time.perf_counter() - start) * 1000)
+            if count_queries is not None:
+                mine_queries.append(count_queries)
+            if status >= 400:
+                mine_errors += 1
+        connection.close()
+        with lock:
+            latencies.extend(mine_latencies)
+            queries.extend(mine_queries)
+            errors.append(mine_errors)
+
+    threads = [threading.Thread(target=worker, args=(count, data['users'][i % len(data['users'])]))
+               for i, count in enumerate(per_thread) if count]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def milliseconds(fraction):
+        value = percentile(latencies, fraction)
+        return None if value is None else round(value, 2)
+
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': milliseconds(0.50),
+        'p95_ms': milliseconds(0.95),
+        'p99_ms': milliseconds(0.99),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'errors': sum(errors),
+    }
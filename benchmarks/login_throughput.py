@@ -0,0 +1,128 @@
+"""
+Login throughput of legitimate users during a credential-stuffing burst.
+
+Runs users logging in with their password from their own addresses next
+to attackers trying wrong passwords on the same usernames from a few
+addresses, once without the login throttle and once with the
+POLLS_LOGIN_THROTTLES of mysite.settings, and prints for both the
+successful logins per second, the attempts rejected and the CPU time
+spent, as JSON::
+
+    python -m benchmarks.login_throughput --users 4 --attackers 8 --seconds 5
+
+``--ip-limit`` and ``--username-limit`` (``attempts/seconds``) replace the
+limits of the settings, e.g. to see them bite in a short run.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+
+def run(throttles, usernames, password, args):
+    """Run users and attackers for ``args.seconds`` and return what they achieved."""
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+
+    settings.POLLS_LOGIN_THROTTLES = throttles
+    cache.clear()
+    login_url = reverse('polls:login')
+    deadline = time.perf_counter() + args.seconds
+    counts = {'logins': 0, 'user_rejected': 0, 'attempts': 0, 'attack_rejected': 0}
+    lock = threading.Lock()
+
+    def worker(kind, ip):
+        done = rejected = 0
+        while time.perf_counter() < deadline:
+            username = random.choice(usernames)
+            response = Client().post(login_url, {
+                'username': username,
+                'password': password if kind == 'user' else 'guess{}'.format(random.random()),
+            }, REMOTE_ADDR=ip)
+            done += kind == 'attack' or response.status_code == 302
+            rejected += response.status_code == 429
+        connection.close()
+        with lock:
+            counts['logins' if kind == 'user' else 'attempts'] += done
+            counts[kind + '_rejected'] += rejected
+
+    threads = [threading.Thread(target=worker, args=('user', '10.1.0.{}'.format(i))) for i in range(args.users)]
+    threads += [threading.Thread(target=worker, args=('attack', '10.2.0.{}'.format(i % args.attacker_ips)))
+                for i in range(args.attackers)]
+    cpu = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        'throttles': {scope: list(limit) for scope, limit in throttles.items()},
+        'logins_per_second': round(counts['logins'] / args.seconds, 1),
+        'user_attempts_rejected': counts['user_rejected'],
+        'attack_attempts': counts['attempts'],
+        'attack_attempts_rejected': counts['attack_rejected'],
+        'cpu_seconds': round(time.process_time() - cpu, 2),
+    }
+
+
+def limit(value):
+    """Parse an ``attempts/seconds`` limit."""
+    attempts, seconds = value.split('/')
+    return int(attempts), float(seconds)
+
+
+def main():
+    """Parse the arguments, set up a scratch database and print both runs."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=4, help='Threads of legitimate users.')
+    parser.add_argument('--attackers', type=int, default=8, help='Threads of attackers.')
+    parser.add_argument('--attacker-ips', type=int, default=2, help='Addresses the attackers share.')
+    parser.add_argument('--accounts', type=int, default=50, help='Usernames the users and attackers pick from.')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--ip-limit', type=limit, help='Attempts per address, as attempts/seconds.')
+    parser.add_argument('--username-limit', type=limit, help='Attempts per username, as attempts/seconds.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from mysite.testing import plain_static_storage
+
+    setup_test_environment()
+    static_storage = plain_static_storage()
+    static_storage.enable()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    throttles = dict(settings.POLLS_LOGIN_THROTTLES)
+    for scope in ('ip', 'username'):
+        if getattr(args, scope + '_limit'):
+            throttles[scope] = getattr(args, scope + '_limit')
+    # Every attempt is logged by the login view.
+    logging.getLogger('polls').setLevel(logging.ERROR)
+    try:
+        password = 'Bench-password-1'
+        # One hash for every account, so seeding does not take a hash per user.
+        encoded = make_password(password)
+        User.objects.bulk_create([User(username='bench{}'.format(i), password=encoded) for i in range(args.accounts)])
+        usernames = list(User.objects.values_list('username', flat=True))
+        report = [run({}, usernames, password, args), run(throttles, usernames, password, args)]
+    finally:
+        runner.teardown_databases(old_config)
+        static_storage.disable()
+        teardown_test_environment()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
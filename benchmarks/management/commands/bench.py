@@ -0,0 +1,81 @@
+"""Load test the polls endpoints and report the results as JSON."""
+import json
+import random
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks import load
+from mysite.testing import plain_static_storage
+
+
+class Command(BaseCommand):
+    """Seed a scratch database, load test the endpoints and print latency and throughput."""
+
+    help = ('Seed a scratch copy of the database with questions, choices, users and votes, '
+            'then load test the polls endpoints and print the results as JSON.')
+
+    def add_arguments(self, parser):
+        """Describe the size of the data set and of the load."""
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--choices', type=int, default=5, help='Choices per question.')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--votes-per-user', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Threads sending requests.')
+        parser.add_argument('--endpoints', nargs='+', choices=load.ENDPOINTS, default=list(load.ENDPOINTS))
+        parser.add_argument('--transport', choices=sorted(load.TRANSPORTS), default='client',
+                            help='Use the test client (counts queries), a local WSGI server, the ASGI '
+                                 'handler on one event loop or a local uvicorn server (set '
+                                 'POLLS_ASYNC_VIEWS=true for the async views).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for comparable runs.')
+        parser.add_argument('--output', help='Also write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark on a scratch database that is destroyed afterwards."""
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        if options['transport'] == 'uvicorn' and load.uvicorn is None:
+            raise CommandError('The uvicorn transport needs uvicorn installed.')
+        random.seed(options['seed'])
+        setup_test_environment()
+        static_storage = plain_static_storage()
+        static_storage.enable()
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, '127.0.0.1']
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        transport = None
+        try:
+            data = load.seed(options['questions'], options['choices'], options['users'], options['votes_per_user'])
+            transport = load.TRANSPORTS[options['transport']]()
+            results = {endpoint: load.drive(transport, endpoint, data, options['requests'], options['concurrency'])
+                       for endpoint in options['endpoints']}
+        finally:
+            if transport is not None:
+                transport.close()
+            runner.teardown_databases(old_config)
+            static_storage.disable()
+            teardown_test_environment()
+        report = {
+            'commit': self.commit(),
+            'options': {name: options[name] for name in (
+                'questions', 'choices', 'users', 'votes_per_user', 'requests', 'concurrency', 'transport', 'seed')},
+            'async_views': settings.POLLS_ASYNC_VIEWS,
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    def commit(self):
+        """Return the current git commit, so reports of two commits can be compared."""
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=settings.BASE_DIR, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,116 @@
+"""
+Concurrent readers and writers against the vote and results views.
+
+Runs the same mix of vote POSTs and results GETs on a scratch database,
+once with the 'default' SQLite profile and no persistent connections and
+once with the 'production' profile of mysite.settings, and prints the
+throughput of both as JSON. The cache is off during both runs, so every
+read reaches SQLite instead of polls.cache::
+
+    python -m benchmarks.sqlite_concurrency --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import threading
+import time
+
+
+def run(profile, conn_max_age, question, choices, users, args):
+    """Run readers and writers for ``args.seconds`` and return their throughput."""
+    from django.conf import settings
+    from django.db import connection, connections
+    from django.test import Client
+    from django.urls import reverse
+
+    settings.SQLITE_PRAGMAS = settings.SQLITE_PROFILES[profile]
+    connections['default'].settings_dict['CONN_MAX_AGE'] = conn_max_age
+    connection.close()
+    results_url = reverse('polls:results', args=(question.pk,))
+    vote_url = reverse('polls:vote', args=(question.pk,))
+    deadline = time.perf_counter() + args.seconds
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def worker(kind, user):
+        client = Client()
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                if user is not None and not client.session.get('_auth_user_id'):
+                    client.force_login(user)
+                if kind == 'writes':
+                    response = client.post(vote_url, {'choice': random.choice(choices).pk})
+                    ok = response.status_code == 302
+                else:
+                    ok = client.get(results_url).status_code == 200
+            except Exception:
+                ok = False
+            done += ok
+            errors += not ok
+        connection.close()
+        with lock:
+            counts[kind] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=worker, args=('writes', users[i])) for i in range(args.writers)]
+    threads += [threading.Thread(target=worker, args=('reads', None)) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        'profile': profile,
+        'conn_max_age': conn_max_age,
+        'reads_per_second': round(counts['reads'] / args.seconds, 1),
+        'writes_per_second': round(counts['writes'] / args.seconds, 1),
+        'errors': counts['errors'],
+    }
+
+
+def main():
+    """Parse the arguments, set up a scratch database and print both runs."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--choices', type=int, default=5)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+    from django.utils import timezone
+
+    from mysite.testing import plain_static_storage
+    from polls.models import Question
+
+    setup_test_environment()
+    static_storage = plain_static_storage()
+    static_storage.enable()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        now = timezone.now()
+        question = Question.objects.create(question_text='Benchmark question',
+                                           pub_date=now - datetime.timedelta(days=1),
+                                           end_date=now + datetime.timedelta(days=1))
+        choices = [question.choice_set.create(choice_text='Choice {}'.format(i)) for i in range(args.choices)]
+        users = [User.objects.create_user('bench{}'.format(i)) for i in range(args.writers)]
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            report = [run('default', 0, question, choices, users, args),
+                      run('production', 60, question, choices, users, args)]
+    finally:
+        runner.teardown_databases(old_config)
+        static_storage.disable()
+        teardown_test_environment()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
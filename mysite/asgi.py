@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+os.environ.setdefault('POLLS_ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.POLLS_VOTE_BUFFER:
+    # Replay the ballots spooled by crashed workers and start flushing.
+    from polls.buffer import get_buffer  # noqa: E402
+    get_buffer()
@@ -44,14 +44,23 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'polls.middleware.RequestMetricsMiddleware',
+    'polls.middleware.PrimaryStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Serves STATIC_ROOT before the other middleware, with its own precompressed files.
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Compress the body, then ConditionalGetMiddleware sets the ETag of the
+    # uncompressed body and answers If-None-Match with 304.
+    'polls.middleware.CompressionMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'polls.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,9 +70,16 @@ ROOT_URLCONF = 'mysite.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': ['./templates', os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'OPTIONS': {
+            # Compiled templates are kept for the life of the process, so a
+            # template is only looked up and parsed once.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -76,6 +92,14 @@ TEMPLATES = [
 
 LOGIN_REDIRECT_URL = 'polls:index'
 
+# Sessions are read from the cache and only written through to the database
+# ('django.contrib.sessions.backends.signed_cookies' avoids the database
+# altogether). The user of a session is cached in each process for
+# POLLS_USER_CACHE_SECONDS, see polls.auth.
+SESSION_ENGINE = env.str('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+POLLS_USER_CACHE_SECONDS = env.int('POLLS_USER_CACHE_SECONDS', default=30)
+POLLS_USER_CACHE_SIZE = 10000
+
 WSGI_APPLICATION = 'mysite.wsgi.application'
 
 
@@ -86,9 +110,147 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Seconds a connection is kept open for the next requests of its thread.
+        'CONN_MAX_AGE': env.int('CONN_MAX_AGE', default=60),
+        'TEST': {
+            # A file rather than the shared in-memory database, so tests that
+            # vote from several threads get SQLite's real locking behaviour.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Read replicas, e.g. DATABASE_REPLICA_URLS=sqlite:////srv/polls/replica.sqlite3
+# (`manage.py sync_replicas` copies the primary to SQLite replicas). Reads
+# go to a random replica and writes to the primary, see polls.db.
+POLLS_DATABASE_REPLICAS = []
+for number, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[]), 1):
+    POLLS_DATABASE_REPLICAS.append('replica{}'.format(number))
+    DATABASES['replica{}'.format(number)] = {
+        **env.db_url_config(url),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['polls.db.PrimaryReplicaRouter']
+
+# Seconds the reads of a browser stay on the primary after it wrote, which
+# must cover the replication lag. Cached pages filled from a replica during
+# that time are refilled once it is over (see polls.cache).
+POLLS_REPLICA_PIN_SECONDS = env.int('POLLS_REPLICA_PIN_SECONDS', default=5)
+
+# PRAGMAs run by polls.db on every new SQLite connection. SQLITE_PROFILE
+# picks 'production' (WAL journal, so readers never wait for the writer)
+# or 'default' (SQLite's own settings).
+
+SQLITE_PROFILES = {
+    'default': {
+        'journal_mode': 'delete',
+        'synchronous': 'full',
+    },
+    'production': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': env.int('SQLITE_BUSY_TIMEOUT_MS', default=20000),
+        'mmap_size': env.int('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024),
+        # Negative sizes are in KiB.
+        'cache_size': env.int('SQLITE_CACHE_SIZE', default=-64000),
+        'temp_store': 'memory',
+    },
+}
+
+SQLITE_PRAGMAS = SQLITE_PROFILES[env.str('SQLITE_PROFILE', default='production')]
+
+# Cache
+# Set CACHE_URL to e.g. filecache:///var/tmp/polls or rediscache://127.0.0.1:6379/1
+# when running several processes: LocMemCache is per process, so the login
+# throttles would not be shared between them.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Seconds a question, its choices and its tally stay cached. Changes to them
+# are picked up at once, as the signals in polls.signals bump their version.
+POLLS_CACHE_TIMEOUT = env.int('POLLS_CACHE_TIMEOUT', default=300)
+
+# Seconds a page of the index stays cached. Also bounds how late a question
+# is shown as open or closed after its pub_date or end_date passes.
+POLLS_CACHE_LIST_TIMEOUT = env.int('POLLS_CACHE_LIST_TIMEOUT', default=30)
+
+# Seconds clients may cache the JSON API responses of closed polls.
+POLLS_API_CLOSED_MAX_AGE = env.int('POLLS_API_CLOSED_MAX_AGE', default=24 * 60 * 60)
+
+# Seconds browsers may reuse the detail and results pages of open polls; the
+# results page also refreshes itself from the live results stream.
+POLLS_OPEN_POLL_MAX_AGE = env.int('POLLS_OPEN_POLL_MAX_AGE', default=5)
+# Seconds the results page of a poll frozen by `manage.py close_polls` is
+# cached as immutable. Closed polls without a snapshot use
+# POLLS_API_CLOSED_MAX_AGE, as a recount may still change them.
+POLLS_FROZEN_RESULTS_MAX_AGE = env.int('POLLS_FROZEN_RESULTS_MAX_AGE', default=365 * 24 * 60 * 60)
+
+# Responses smaller than this are not compressed (GZipMiddleware never
+# compresses under 200 bytes), and the brotli quality (0-11) of the others.
+POLLS_COMPRESS_MIN_BYTES = env.int('POLLS_COMPRESS_MIN_BYTES', default=500)
+POLLS_BROTLI_QUALITY = env.int('POLLS_BROTLI_QUALITY', default=5)
+
+# Vote ingestion
+# With POLLS_VOTE_BUFFER on, the vote view only spools the ballot and a
+# background thread records the spooled ballots in batches. Turn it off to
+# record every vote synchronously.
+
+POLLS_VOTE_BUFFER = env.bool('POLLS_VOTE_BUFFER', default=False)
+POLLS_VOTE_BUFFER_DIR = env.str('POLLS_VOTE_BUFFER_DIR', default=str(BASE_DIR / 'vote_spool'))
+POLLS_VOTE_BUFFER_FLUSH_MS = env.int('POLLS_VOTE_BUFFER_FLUSH_MS', default=200)
+POLLS_VOTE_BUFFER_MAX_BALLOTS = env.int('POLLS_VOTE_BUFFER_MAX_BALLOTS', default=500)
+# Failed flushes after which a batch is renamed to .bad and left for an operator.
+POLLS_VOTE_BUFFER_MAX_ATTEMPTS = env.int('POLLS_VOTE_BUFFER_MAX_ATTEMPTS', default=3)
+
+# Seconds before now the vote rollup (polls.rollup) stops at, longer than
+# any vote transaction, so votes committed late are rolled up by the next run.
+POLLS_ROLLUP_LAG_SECONDS = env.int('POLLS_ROLLUP_LAG_SECONDS', default=60)
+
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '%(asctime)s: %(name)s:%(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'polls': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+# Serve the read and vote pages with the async views of polls.async_views.
+# mysite/asgi.py turns this on.
+POLLS_ASYNC_VIEWS = env.bool('POLLS_ASYNC_VIEWS', default=False)
+
+# Live results stream (polls.stream): seconds between heartbeats, watchers
+# per process, events queued for a slow watcher before it is resynced, and
+# the life of one stream before the browser reconnects.
+POLLS_STREAM_HEARTBEAT_SECONDS = env.float('POLLS_STREAM_HEARTBEAT_SECONDS', default=15)
+POLLS_STREAM_MAX_CLIENTS = env.int('POLLS_STREAM_MAX_CLIENTS', default=1000)
+POLLS_STREAM_QUEUE_SIZE = 32
+POLLS_STREAM_MAX_SECONDS = 300
+POLLS_STREAM_RETRY_MS = 3000
+
+# Requests slower than this many milliseconds are logged by
+# polls.middleware.RequestMetricsMiddleware.
+POLLS_SLOW_REQUEST_MS = env.int('POLLS_SLOW_REQUEST_MS', default=500)
+
 # Oauth authentication
 
 AUTHENTICATION_BACKENDS = (
@@ -96,6 +258,14 @@ AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',  
 )
 
+# Token buckets in front of authenticate() on the login and signup pages, as
+# (attempts, seconds): attempts per client IP address and per username. The
+# IP limit is generous as a campus may reach the site from few addresses.
+POLLS_LOGIN_THROTTLES = {
+    'ip': (100, 60),
+    'username': (10, 300),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -124,8 +294,6 @@ TIME_ZONE = 'Asia/Bangkok'
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 
@@ -133,3 +301,19 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+# `python manage.py collectstatic` copies the static files here with hashed
+# names and .gz/.br variants, which the WSGI application serves with
+# far-future cache headers. Without its manifest, pages using {% static %}
+# fail unless DEBUG is on (see mysite.testing for the tests and benchmarks).
+STATIC_ROOT = env.str('STATIC_ROOT', default=os.path.join(BASE_DIR, 'staticfiles'))
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+TEST_RUNNER = 'mysite.testing.TestRunner'
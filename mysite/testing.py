@@ -0,0 +1,36 @@
+"""Test runner of the project, and the settings the tests and benchmarks share."""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def plain_static_storage():
+    """
+    Return an override of STORAGES that keeps the static files under their plain names.
+
+    The hashed names of STORAGES come from the manifest written by
+    collectstatic, which the tests and the benchmarks do not run.
+    """
+    return override_settings(STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run the tests with the static files under their plain names.
+
+    The static file tests enable the hashed storage themselves.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        """Swap the hashed static files storage for the plain one."""
+        super().setup_test_environment(**kwargs)
+        self.static_storage = plain_static_storage()
+        self.static_storage.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        """Restore the static files storage of the settings."""
+        self.static_storage.disable()
+        super().teardown_test_environment(**kwargs)
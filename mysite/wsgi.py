@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.POLLS_VOTE_BUFFER:
+    # Replay the ballots spooled by crashed workers and start flushing.
+    from polls.buffer import get_buffer  # noqa: E402
+    get_buffer()
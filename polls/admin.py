@@ -1,33 +1,123 @@
 """Configuration for admin site."""
 
 from django.contrib import admin
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
 from .models import Choice, Question, Vote
 
 
+class CappedCountPaginator(Paginator):
+    """
+    Paginator that stops counting rows at ``count_cap``, for tables with millions of rows.
+
+    Once the cap is reached the pages past it are still served: a page is
+    only checked to have rows, and the page range reaches one page past the
+    last page served while there are more rows after it.
+    """
+
+    count_cap = 10000
+    # Pages up to the one after the last full page served.
+    _known_pages = 0
+
+    @cached_property
+    def count(self):
+        """Return the number of rows, or ``count_cap`` if there are more."""
+        return self.object_list[:self.count_cap].count()
+
+    @property
+    def capped(self):
+        """Tell whether the count stopped at the cap, so there may be more rows."""
+        return self.count >= self.count_cap
+
+    @property
+    def num_pages(self):
+        """Return the number of pages of the counted rows, or of the pages served past them."""
+        return max(super().num_pages, self._known_pages)
+
+    def validate_number(self, number):
+        """Check the page number, without an upper bound once the count is capped."""
+        if not self.capped:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        """Return the page ``number``, reading one more row to tell whether another page follows."""
+        if not self.capped:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        self._known_pages = number + 1 if len(rows) > self.per_page else number
+        return self._get_page(rows[:self.per_page], number, self)
+
+
 class ChoiceInline(admin.TabularInline):
     """Edit the configuration of the admin site."""
 
     model = Choice
     extra = 3
+    readonly_fields = ('vote_count',)
 
 
 class QuestionAdmin(admin.ModelAdmin):
     """Edit the configuration of the admin site."""
 
     fieldsets = [
-        (None,               {'fields': ['question_text']}),
+        (None,               {'fields': ['question_text', 'external_id', 'ballot_type']}),
         ('Date information', {'fields': ['pub_date', 'end_date'],
                               'classes': ['collapse']}),
     ]
     inlines = [ChoiceInline]
+    # The vote totals are the denormalized counter of each row, so the
+    # changelist shows them without counting votes.
     list_display = ('question_text', 'pub_date',
-                    'was_published_recently', 'end_date')
+                    'was_published_recently', 'end_date', 'total_votes')
+    readonly_fields = ('total_votes',)
 
-    list_filter = ['pub_date', 'end_date']
-    search_fields = ['question_text']
+    list_filter = ['pub_date', 'end_date', 'ballot_type']
+    # Prefix and exact matches rather than substring matches. The prefix
+    # match is case-insensitive, so it still reads every question_text;
+    # the external_id match uses its unique index.
+    search_fields = ['^question_text', '=external_id']
+    show_full_result_count = False
 
 
-admin.site.register(Question, QuestionAdmin)
-admin.site.register(Vote)
-admin.site.register(Choice)
+class ChoiceAdmin(admin.ModelAdmin):
+    """Edit the configuration of the admin site."""
+
+    list_display = ('choice_text', 'question', 'vote_count')
+    list_select_related = ('question',)
+    raw_id_fields = ('question',)
+    readonly_fields = ('vote_count',)
+    search_fields = ['^choice_text']
+    show_full_result_count = False
 
+
+class VoteAdmin(admin.ModelAdmin):
+    """Edit the configuration of the admin site."""
+
+    list_display = ('pk', 'question', 'choice', 'user')
+    list_select_related = ('question', 'choice', 'user')
+    # Lookups by id and search-as-you-type instead of a <select> of every row.
+    raw_id_fields = ('user', 'choice')
+    autocomplete_fields = ('question',)
+    ordering = ('-pk',)
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+
+
+admin.site.register(Question, QuestionAdmin)
+admin.site.register(Vote, VoteAdmin)
+admin.site.register(Choice, ChoiceAdmin)
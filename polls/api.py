@@ -0,0 +1,185 @@
+"""Read-only JSON API of the polls."""
+import hashlib
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+
+from . import cache
+from .models import Ballot, BallotType, Question, Vote, VoteRollup
+from .views import IndexView
+
+
+def status(question, now):
+    """
+    Return whether ``question`` is 'upcoming', 'open' or 'closed' at ``now``.
+
+    The same rules as Question.objects.with_status(), for a question in memory.
+    """
+    if question.pub_date > now:
+        return 'upcoming'
+    return 'open' if question.end_date > now else 'closed'
+
+
+def question_data(question, now):
+    """Return the fields of a question shared by every endpoint."""
+    return {
+        'id': question.pk,
+        'question_text': question.question_text,
+        'pub_date': question.pub_date,
+        'end_date': question.end_date,
+        'status': status(question, now),
+        'ballot_type': question.ballot_type,
+        'url': reverse('polls:api_question', args=(question.pk,)),
+        'results_url': reverse('polls:api_results', args=(question.pk,)),
+    }
+
+
+class QuestionListView(IndexView):
+    """
+    One page of questions, with the filters and cursor of the index page.
+
+    The page comes from the same cache as the index page; its ETag is a hash
+    of the body, so an unchanged page is answered with a bodiless 304.
+    """
+
+    def get_voted(self, questions):
+        """The API does not show the choices of the user, so they are not read."""
+        return {}
+
+    def render_to_response(self, context, **response_kwargs):
+        """Return the page as JSON, or 304 if the client has it already."""
+        now = timezone.now()
+        response = JsonResponse({
+            'results': [question_data(question, now) for question in context['latest_question_list']],
+            'status': context['status'],
+            'next_cursor': context['next_cursor'],
+        })
+        patch_cache_control(response, no_cache=True)
+        set_response_etag(response)
+        return get_conditional_response(self.request, etag=response['ETag'], response=response)
+
+
+def _published_question(pk):
+    payload = cache.get_question(pk)
+    if payload is None or not payload[0].is_published():
+        raise Http404("No question found matching the query")
+    return payload
+
+
+def _last_change(model):
+    return Subquery(model.objects.filter(question=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1])
+
+
+def _version(question, choices):
+    """
+    Return a token that changes with the question, its choices or its votes, and the time of the last vote.
+
+    The votes are read from the database in one query rather than from the
+    cache versions, which are per process with LocMemCache: a vote recorded
+    by another worker or by a command changes the total or the time of the
+    newest vote. The question and its choices are the ones about to be
+    served, so their digest changes as soon as the page would.
+    """
+    total, last_vote, last_ballot = Question.objects.filter(pk=question.pk).annotate(
+        last_vote=_last_change(Vote), last_ballot=_last_change(Ballot)).values_list(
+        'total_votes', 'last_vote', 'last_ballot').get()
+    modified = max(filter(None, (last_vote, last_ballot)), default=question.pub_date)
+    digest = hashlib.md5(repr((question.question_text, question.pub_date, question.end_date,
+                               [(choice.pk, choice.choice_text) for choice in choices])).encode()).hexdigest()
+    return '{}-{}-{}'.format(total, modified.timestamp(), digest), modified.timestamp()
+
+
+def _conditional(request, question, choices, build):
+    """
+    Return 304 if the client's copy of ``question`` is current, else the JSON made by ``build()``.
+
+    The ETag and Last-Modified come from _version(), so a 304 costs one
+    query and no tally. Closed polls no longer change and may be cached for
+    POLLS_API_CLOSED_MAX_AGE seconds; the others are revalidated every time.
+    """
+    version, modified = _version(question, choices)
+    # The status changes with time alone, without a new version.
+    current_status = status(question, timezone.now())
+
+    def with_headers(response):
+        response['ETag'] = quote_etag('{}-{}'.format(version, current_status))
+        response['Last-Modified'] = http_date(modified)
+        if current_status == 'closed':
+            patch_cache_control(response, public=True, max_age=settings.POLLS_API_CLOSED_MAX_AGE)
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    headers = with_headers(HttpResponse())
+    response = get_conditional_response(request, etag=headers['ETag'], last_modified=int(modified), response=headers)
+    if response is not headers:
+        return response
+    return with_headers(JsonResponse(build()))
+
+
+def question_detail(request, pk):
+    """A published question and its choices."""
+    question, choices = _published_question(pk)
+
+    def build():
+        data = question_data(question, timezone.now())
+        data['choices'] = [{'id': choice.pk, 'choice_text': choice.choice_text} for choice in choices]
+        return data
+
+    return _conditional(request, question, choices, build)
+
+
+def question_results(request, pk):
+    """The vote count and percentage of every choice of a published question."""
+    question, choices = _published_question(pk)
+
+    def build():
+        choices, total = cache.get_tally(question)
+        data = question_data(question, timezone.now())
+        data['total_votes'] = total
+        data['choices'] = [{'id': choice.pk, 'choice_text': choice.choice_text, 'votes': choice.vote_count,
+                            'percentage': choice.percentage} for choice in choices]
+        return data
+
+    return _conditional(request, question, choices, build)
+
+
+def question_timeline(request, pk):
+    """
+    The votes cast on every choice of a published question, hour by hour.
+
+    The series is read from ``VoteRollup`` (see polls.rollup) in one range
+    query on its (question, bucket_hour) index, optionally bounded by the
+    ``?since=`` and ``?until=`` ISO 8601 times. ``votes`` lists the counts
+    in the order of ``choices``; hours without votes are left out. Only
+    plurality questions have one: hourly counts of approval and ranked
+    ballots would not add up to their results.
+    """
+    question, choices = _published_question(pk)
+    if question.ballot_type != BallotType.PLURALITY:
+        raise Http404("Only plurality questions have a timeline.")
+    rollups = VoteRollup.objects.filter(question=question.pk)
+    for name, lookup in (('since', 'bucket_hour__gte'), ('until', 'bucket_hour__lt')):
+        if name in request.GET:
+            try:
+                value = parse_datetime(request.GET[name])
+            except ValueError:
+                value = None
+            if value is None:
+                return HttpResponseBadRequest('{} must be an ISO 8601 date and time.'.format(name))
+            rollups = rollups.filter(**{lookup: timezone.make_aware(value) if timezone.is_naive(value) else value})
+    position = {choice.pk: index for index, choice in enumerate(choices)}
+    series = {}
+    for hour, choice_id, count in rollups.order_by('bucket_hour').values_list('bucket_hour', 'choice_id', 'count'):
+        if choice_id in position:
+            series.setdefault(hour, [0] * len(choices))[position[choice_id]] = count
+    data = question_data(question, timezone.now())
+    data['choices'] = [{'id': choice.pk, 'choice_text': choice.choice_text} for choice in choices]
+    data['timeline'] = [{'hour': hour, 'votes': votes, 'total': sum(votes)} for hour, votes in series.items()]
+    return JsonResponse(data)
@@ -7,3 +7,15 @@ class PollsConfig(AppConfig):
     """Poll configuration."""
 
     name = 'polls'
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        """Connect the signal receivers and register the deployment checks."""
+        from django.core import checks
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .db import configure_sqlite
+        from .throttle import check_shared_cache
+        connection_created.connect(configure_sqlite)
+        checks.register(check_shared_cache, checks.Tags.caches, deploy=True)
@@ -0,0 +1,123 @@
+"""Async versions of the read and vote views, served under ASGI."""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import reverse
+
+from . import buffer, cache, stream, views
+from .models import Ballot, BallotType, Vote
+
+
+class IndexView(views.IndexView):
+    """Async version of the index page."""
+
+    async def get(self, request, *args, **kwargs):
+        """Render one page of questions, reading them with async iteration."""
+        questions = self.page_queryset()
+
+        async def compute():
+            return self.paginate([question async for question in questions])
+
+        self.object_list, self.next_cursor = await cache.aget_question_page(self.status, self.cursor, compute)
+        # The session and the user are only loaded synchronously.
+        self.voted = await sync_to_async(super().get_voted)(self.object_list)
+        return self.render_to_response(self.get_context_data())
+
+    def get_voted(self, questions):
+        """Return the choices of the user read by get()."""
+        return self.voted
+
+
+class DetailView(views.DetailView):
+    """Async version of the detail page."""
+
+    async def get(self, request, *args, **kwargs):
+        """Render the cached question and its choices."""
+        self.object = self.unpack(await cache.aget_question(self.kwargs['pk']))
+        self.voted = await sync_to_async(super().get_voted)()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    def get_voted(self):
+        """Return the choices of the user read by get()."""
+        return self.voted
+
+
+class ResultsView(views.ResultsView):
+    """Async version of the results page."""
+
+    async def get(self, request, *args, **kwargs):
+        """Render the cached tally of the question."""
+        payload = await cache.aget_question(self.kwargs['pk'])
+        if payload is None:
+            raise Http404("No question found matching the query")
+        self.object = payload[0]
+        self.tally = await cache.aget_tally(self.object)
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    def get_tally(self):
+        """Return the tally read by get()."""
+        return self.tally
+
+
+async def vote(request, question_id):
+    """Async version of polls.views.vote."""
+    # The session and the user are only loaded synchronously.
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+    payload = await cache.aget_question(question_id)
+    if payload is None:
+        raise Http404("No question found matching the query")
+    question, choices = payload
+
+    if not question.can_vote():
+        messages.error(request, "This poll was not in the polling period.")
+        return HttpResponseRedirect(reverse('polls:index'))
+    try:
+        selected = views.selected_choices(question, choices, request.POST)
+    except ValueError as error:
+        # Redisplay the question voting form.
+        return TemplateResponse(request, 'polls/detail.html', {
+            'question': question,
+            'error_message': str(error),
+            **views.vote_form_context(choices, []),
+        })
+    # Transactions are not available to async code.
+    if question.ballot_type != BallotType.PLURALITY:
+        await sync_to_async(Ballot.objects.cast)(question, user, selected)
+    elif settings.POLLS_VOTE_BUFFER:
+        vote_buffer = await sync_to_async(buffer.get_buffer)()
+        vote_buffer.add(question.pk, user.pk, selected[0].pk)
+    else:
+        await sync_to_async(Vote.objects.record)(question, user, selected[0])
+    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+
+
+async def results_stream(request, pk):
+    """
+    Stream the results of a question as Server-Sent Events.
+
+    The stream starts with a ``snapshot`` event of the tally and goes on
+    with a ``delta`` event of the changed vote counts after every vote.
+    Closed polls never change, and under WSGI a stream would hold a worker
+    thread, so both answer 204 No Content, which stops the browser from
+    reconnecting.
+    """
+    payload = await cache.aget_question(pk)
+    if payload is None or not payload[0].is_published():
+        raise Http404("No question found matching the query")
+    question = payload[0]
+    if not isinstance(request, ASGIRequest) or not question.can_vote():
+        return HttpResponse(status=204)
+    if stream.is_full():
+        response = HttpResponse("Too many watchers, try again later.", status=503)
+        response['Retry-After'] = settings.POLLS_STREAM_RETRY_MS // 1000
+        return response
+    response = StreamingHttpResponse(stream.events(question), content_type='text/event-stream')
+    response['X-Accel-Buffering'] = 'no'
+    response['Cache-Control'] = 'no-cache'
+    return response
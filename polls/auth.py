@@ -0,0 +1,54 @@
+"""Per-process cache of the users of authenticated sessions."""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib import auth
+
+_users = {}
+_lock = threading.Lock()
+
+
+def get_user(request):
+    """
+    Return the user of the request's session, like django.contrib.auth.get_user().
+
+    Users are cached for POLLS_USER_CACHE_SECONDS under their id and the
+    session auth hash stored in the session. A password change gives the
+    user a new hash, so sessions holding the old one miss the cache and are
+    logged out by django.contrib.auth; saving a user or logging out also
+    drops the user from the cache of this process (see polls.signals).
+    """
+    session = request.session
+    try:
+        key = (session[auth.SESSION_KEY], session[auth.BACKEND_SESSION_KEY], session[auth.HASH_SESSION_KEY])
+    except KeyError:
+        return auth.get_user(request)
+    now = time.monotonic()
+    with _lock:
+        expires, user = _users.get(key, (0, None))
+    if expires > now:
+        # Every request gets its own copy, as views may change their user.
+        return copy.copy(user)
+    user = auth.get_user(request)
+    if user.is_authenticated and settings.POLLS_USER_CACHE_SECONDS > 0:
+        with _lock:
+            if len(_users) >= settings.POLLS_USER_CACHE_SIZE:
+                for stale in [key for key, (expires, _) in _users.items() if expires <= now] or list(_users):
+                    del _users[stale]
+            _users[key] = (now + settings.POLLS_USER_CACHE_SECONDS, copy.copy(user))
+    return user
+
+
+def forget(user_id):
+    """Drop a user from the cache of this process."""
+    with _lock:
+        for key in [key for key in _users if key[0] == str(user_id)]:
+            del _users[key]
+
+
+def clear():
+    """Drop every user from the cache of this process."""
+    with _lock:
+        _users.clear()
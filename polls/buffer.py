@@ -0,0 +1,267 @@
+"""Write-behind buffer that records votes in batches."""
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache, stream
+from .models import Choice, Question, Vote
+
+logger = logging.getLogger(__name__)
+
+
+def apply_ballots(ballots):
+    """
+    Record a batch of ballots in one transaction.
+
+    Later ballots of a user on a question replace earlier ones, and ballots
+    for choices or users that no longer exist are dropped.
+
+    Args:
+        ballots: An iterable of (question_id, user_id, choice_id) in the
+            order they were cast.
+
+    Returns:
+        int: The number of votes created or changed.
+    """
+    latest = {}
+    for question_id, user_id, choice_id in ballots:
+        latest[question_id, user_id] = choice_id
+    if not latest:
+        return 0
+    question_ids = {question_id for question_id, _ in latest}
+    valid_choices = set(Choice.objects.filter(pk__in=set(latest.values()), question__in=question_ids)
+                        .values_list('pk', 'question_id'))
+    valid_users = set(User.objects.filter(pk__in={user_id for _, user_id in latest}).values_list('pk', flat=True))
+    latest = {(question_id, user_id): choice_id for (question_id, user_id), choice_id in latest.items()
+              if (choice_id, question_id) in valid_choices and user_id in valid_users}
+
+    with transaction.atomic():
+        # Write first so the votes read below cannot change before the commit
+        # (row locks on PostgreSQL, the database lock on SQLite).
+        Question.objects.filter(pk__in=question_ids).update(total_votes=F('total_votes'))
+        existing = {(vote.question_id, vote.user_id): vote for vote in Vote.objects.filter(
+            question__in=question_ids, user__in={user_id for _, user_id in latest})}
+        created, changed = [], []
+        now = timezone.now()
+        choice_deltas = collections.Counter()
+        question_deltas = collections.Counter()
+        for (question_id, user_id), choice_id in latest.items():
+            vote = existing.get((question_id, user_id))
+            if vote is None:
+                created.append(Vote(question_id=question_id, user_id=user_id, choice_id=choice_id))
+                choice_deltas[choice_id] += 1
+                question_deltas[question_id] += 1
+            elif vote.choice_id != choice_id:
+                choice_deltas[vote.choice_id] -= 1
+                choice_deltas[choice_id] += 1
+                vote.choice_id = choice_id
+                # bulk_update() does not set auto_now fields.
+                vote.updated_at = now
+                changed.append(vote)
+        Vote.objects.bulk_create(created)
+        Vote.objects.bulk_update(changed, ['choice', 'updated_at'])
+        for choice_id, delta in choice_deltas.items():
+            if delta:
+                Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') + delta)
+        for question_id, delta in question_deltas.items():
+            Question.objects.filter(pk=question_id).update(total_votes=F('total_votes') + delta)
+    # Bulk writes send no signals, so the cached tallies are bumped here.
+    cache.bump(*[cache.tally_version_key(question_id) for question_id in question_ids],
+               *{cache.voted_version_key(user_id) for _, user_id in latest})
+    for question_id in question_ids:
+        stream.notify(question_id)
+    return len(created) + len(changed)
+
+
+class VoteBuffer:
+    """
+    Queue of ballots spooled to a local file and flushed in batches.
+
+    Every process appends its ballots to its own ``<pid>.spool`` file in the
+    spool directory. A flush renames the spool to a ``.batch`` file and
+    records the batch; the file is removed only once its transaction is
+    committed, so ballots of a crashed process are replayed by the next one
+    that starts. Batches are recorded in order, each on its own, so the
+    last ballot of a user always wins; a batch that fails ``max_attempts``
+    times is renamed to ``.bad`` so it cannot hold back the others.
+    """
+
+    def __init__(self, directory, flush_interval=0.2, max_ballots=500, max_attempts=3):
+        """Create a stopped buffer spooling to ``directory``."""
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.max_ballots = max_ballots
+        self.max_attempts = max_attempts
+        self._attempts = collections.Counter()
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._spool = None
+        self._pending = 0
+        self._thread = None
+
+    @property
+    def spool_path(self):
+        """Return the path of the spool file of this process."""
+        return self.directory / '{}.spool'.format(self.pid)
+
+    def add(self, question_id, user_id, choice_id):
+        """Spool one ballot; it is recorded by the next flush."""
+        line = json.dumps([question_id, user_id, choice_id]) + '\n'
+        with self._lock:
+            if self._spool is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._spool = open(self.spool_path, 'a')
+            self._spool.write(line)
+            self._spool.flush()
+            self._pending += 1
+            full = self._pending >= self.max_ballots
+        if full:
+            self._wakeup.set()
+
+    def _rotate(self):
+        with self._lock:
+            if self._spool is None:
+                return
+            self._spool.close()
+            self._spool = None
+            self._pending = 0
+            self.spool_path.rename(self.directory / '{}-{}.batch'.format(self.pid, time.time_ns()))
+
+    def _batches(self):
+        batches = self.directory.glob('{}-*.batch'.format(self.pid))
+        return sorted(batches, key=lambda path: int(path.stem.split('-')[1]))
+
+    @staticmethod
+    def _read(path):
+        """Return the ballots of a batch file, skipping the lines that are not ballots."""
+        ballots = []
+        with open(path) as batch:
+            for number, line in enumerate(batch, 1):
+                if not line.strip():
+                    continue
+                try:
+                    ballot = json.loads(line)
+                except ValueError:
+                    # A process that crashed while writing leaves a truncated last line.
+                    ballot = None
+                if not (isinstance(ballot, list) and len(ballot) == 3
+                        and all(type(value) is int for value in ballot)):
+                    logger.warning("Skipped malformed ballot at {}:{}: {!r}".format(path.name, number, line))
+                    continue
+                ballots.append(ballot)
+        return ballots
+
+    def flush(self):
+        """
+        Record every spooled ballot of this process, one batch at a time.
+
+        A batch that cannot be recorded stops the flush: it and the later
+        batches are retried by the next one, so older ballots never replace
+        newer ones. It is renamed to ``.bad`` after ``max_attempts`` failures.
+
+        Returns:
+            int: The number of votes created or changed.
+        """
+        with self._flush_lock:
+            self._rotate()
+            count = 0
+            for path in self._batches():
+                try:
+                    count += apply_ballots(self._read(path))
+                except Exception:
+                    self._attempts[path.name] += 1
+                    if self._attempts[path.name] < self.max_attempts:
+                        logger.exception("Could not record {}, it will be retried.".format(path.name))
+                        break
+                    logger.exception("Could not record {} {} times, set aside as .bad.".format(
+                        path.name, self.max_attempts))
+                    path.rename(path.with_suffix('.bad'))
+                else:
+                    path.unlink()
+                self._attempts.pop(path.name, None)
+            return count
+
+    def adopt_orphans(self):
+        """
+        Take over the spool and batch files left by processes that are not running any more.
+
+        Workers starting together race for the same orphans; a file another
+        one took first is skipped, as are files not named after a process.
+        """
+        if not self.directory.is_dir():
+            return
+        for path in sorted(self.directory.iterdir()):
+            if path.suffix not in ('.spool', '.batch'):
+                continue
+            try:
+                pid = int(path.stem.split('-')[0])
+            except ValueError:
+                logger.warning("Skipped {}, it is not named after a process.".format(path.name))
+                continue
+            if pid == self.pid or _is_running(pid):
+                continue
+            try:
+                path.rename(self.directory / '{}-{}.batch'.format(self.pid, time.time_ns()))
+            except FileNotFoundError:
+                pass
+
+    def start(self):
+        """Replay the ballots of crashed processes and start the flusher thread."""
+        self.adopt_orphans()
+        self.flush()
+        self._thread = threading.Thread(target=self._run, name='vote-buffer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not flush the vote buffer, the ballots stay spooled.")
+                connection.close()
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """
+    Return the started vote buffer of this process, replaying crashed spools the first time.
+
+    A process forked from one with a buffer (as gunicorn --preload does)
+    does not inherit its flusher thread, so it starts a buffer of its own.
+    """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None or _buffer.pid != os.getpid():
+            _buffer = VoteBuffer(settings.POLLS_VOTE_BUFFER_DIR,
+                                 flush_interval=settings.POLLS_VOTE_BUFFER_FLUSH_MS / 1000,
+                                 max_ballots=settings.POLLS_VOTE_BUFFER_MAX_BALLOTS,
+                                 max_attempts=settings.POLLS_VOTE_BUFFER_MAX_ATTEMPTS)
+            _buffer.start()
+        return _buffer
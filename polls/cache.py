@@ -0,0 +1,192 @@
+"""Versioned cache of the data behind the poll pages."""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import db
+from .models import Ballot, BallotType, Question, Vote
+
+_MISSING = object()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def stats():
+    """Return the number of cache hits and misses of this process."""
+    with _lock:
+        return dict(_stats)
+
+
+def _count(outcome):
+    with _lock:
+        _stats[outcome] += 1
+
+
+def question_version_key(pk):
+    """Return the key of the version of a question and its choices."""
+    return 'polls:question:{}'.format(pk)
+
+
+def tally_version_key(pk):
+    """Return the key of the version of the tally of a question."""
+    return 'polls:tally:{}'.format(pk)
+
+
+def voted_version_key(user_id):
+    """Return the key of the version of the choices of a user."""
+    return 'polls:voted:{}'.format(user_id)
+
+
+LIST_VERSION_KEY = 'polls:questions'
+
+
+def _phase(version):
+    """
+    Return the part of the cache keys for the entries under ``version``.
+
+    For POLLS_REPLICA_PIN_SECONDS after a change the replicas may not have
+    it yet, so the entries filled meanwhile are kept apart: those of the
+    pinned requests, read from the primary, from those read from a replica,
+    which are refilled from the caught-up replicas once the time is over.
+    """
+    if not settings.POLLS_DATABASE_REPLICAS or time.time_ns() - version >= settings.POLLS_REPLICA_PIN_SECONDS * 10**9:
+        return version
+    return '{}{}'.format(version, 'p' if db.using_primary() else 'r')
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return _phase(version)
+
+
+def bump(*keys):
+    """
+    Give new versions to the given version keys.
+
+    Entries cached under the old versions are never read again and expire
+    on their own.
+    """
+    version = time.time_ns()
+    cache.set_many({key: version for key in keys}, None)
+
+
+async def _aversion(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return _phase(version)
+
+
+# None (a missing row) is not cached.
+def _get_or_set(key, compute, timeout):
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count('hits')
+        return value
+    _count('misses')
+    value = compute()
+    if value is not None:
+        cache.set(key, value, timeout)
+    return value
+
+
+async def _aget_or_set(key, acompute, timeout):
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        _count('hits')
+        return value
+    _count('misses')
+    value = await acompute()
+    if value is not None:
+        await cache.aset(key, value, timeout)
+    return value
+
+
+def get_question(pk):
+    """
+    Return a question and its choices.
+
+    Returns:
+        tuple: The question and the list of its choices, or None if the
+        question does not exist. Missing questions are not cached, so
+        requests for unknown ids cannot evict the cached pages.
+    """
+    def compute():
+        question = Question.objects.select_related('snapshot').filter(pk=pk).first()
+        return question and (question, list(question.choice_set.order_by('pk')))
+
+    key = 'polls:question:{}:{}'.format(pk, _version(question_version_key(pk)))
+    payload = _get_or_set(key, compute, settings.POLLS_CACHE_TIMEOUT)
+    if payload is None:
+        cache.delete(question_version_key(pk))
+    return payload
+
+
+def get_tally(question):
+    """Return the result of ``question.results()``."""
+    key = 'polls:tally:{}:{}'.format(question.pk, _version(tally_version_key(question.pk)))
+    return _get_or_set(key, question.results, settings.POLLS_CACHE_TIMEOUT)
+
+
+def get_voted(user, questions):
+    """
+    Return the choices of ``user`` on ``questions``, read from ``Vote`` or ``Ballot`` by their ballot type.
+
+    Returns:
+        dict: The list of the ids of the chosen choices by question id, in
+        order of preference for ranked questions, for the questions the
+        user voted on.
+    """
+    if not user.is_authenticated or not questions:
+        return {}
+
+    def compute():
+        plurality = [question.pk for question in questions if question.ballot_type == BallotType.PLURALITY]
+        others = [question.pk for question in questions if question.ballot_type != BallotType.PLURALITY]
+        voted = {question_id: [choice_id] for question_id, choice_id in Vote.objects.choices_of(
+            user, plurality).items()}
+        voted.update(Ballot.objects.choices_of(user, others))
+        return voted
+
+    # A digest keeps the key short for memcached however many questions a page has.
+    digest = hashlib.md5(','.join(str(question.pk) for question in questions).encode()).hexdigest()
+    key = 'polls:voted:{}:{}:{}'.format(user.pk, _version(voted_version_key(user.pk)), digest)
+    return _get_or_set(key, compute, settings.POLLS_CACHE_TIMEOUT)
+
+
+def get_question_page(status, cursor, compute):
+    """Return the index page for the given status filter and cursor, made by ``compute()`` on a miss."""
+    key = 'polls:questions:{}:{}:{}'.format(_version(LIST_VERSION_KEY), status, cursor)
+    return _get_or_set(key, compute, settings.POLLS_CACHE_LIST_TIMEOUT)
+
+
+async def aget_question(pk):
+    """Async version of get_question()."""
+    async def compute():
+        question = await Question.objects.select_related('snapshot').filter(pk=pk).afirst()
+        return question and (question, [choice async for choice in question.choice_set.order_by('pk')])
+
+    key = 'polls:question:{}:{}'.format(pk, await _aversion(question_version_key(pk)))
+    payload = await _aget_or_set(key, compute, settings.POLLS_CACHE_TIMEOUT)
+    if payload is None:
+        await cache.adelete(question_version_key(pk))
+    return payload
+
+
+async def aget_tally(question):
+    """Async version of get_tally()."""
+    key = 'polls:tally:{}:{}'.format(question.pk, await _aversion(tally_version_key(question.pk)))
+    return await _aget_or_set(key, question.aresults, settings.POLLS_CACHE_TIMEOUT)
+
+
+async def aget_question_page(status, cursor, acompute):
+    """Async version of get_question_page()."""
+    key = 'polls:questions:{}:{}:{}'.format(await _aversion(LIST_VERSION_KEY), status, cursor)
+    return await _aget_or_set(key, acompute, settings.POLLS_CACHE_LIST_TIMEOUT)
@@ -0,0 +1,76 @@
+"""Database connection setup and routing."""
+import contextlib
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Run the SQLITE_PRAGMAS of the settings on a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        # Set first, so the other PRAGMAs wait for a busy database too.
+        if 'busy_timeout' in pragmas:
+            cursor.execute('PRAGMA busy_timeout = {}'.format(pragmas.pop('busy_timeout')))
+        # Changing the journal mode needs an exclusive lock while the mode
+        # itself is kept in the database file, so only change it once.
+        journal_mode = pragmas.pop('journal_mode', None)
+        if journal_mode:
+            cursor.execute('PRAGMA journal_mode')
+            if cursor.fetchone()[0] != journal_mode.lower():
+                cursor.execute('PRAGMA journal_mode = {}'.format(journal_mode))
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+
+
+# Set for the requests whose reads must see their own writes.
+_use_primary = contextvars.ContextVar('polls_use_primary', default=False)
+
+
+def using_primary():
+    """Tell whether the reads of the current request or block are sent to the primary."""
+    return _use_primary.get()
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Send every read made in this block to the primary database."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send writes to ``default`` and reads to a random POLLS_DATABASE_REPLICAS alias.
+
+    Reads go to the primary inside use_primary() and inside a transaction of
+    the primary, so code that writes then reads (such as
+    ``Vote.objects.record``) never reads rows older than its own writes.
+    Migrations only run on the primary; the replicas get them by replication.
+    """
+
+    def db_for_read(self, model, **hints):
+        """Pick a replica, unless the reads must see the writes of the primary."""
+        replicas = settings.POLLS_DATABASE_REPLICAS
+        if not replicas or using_primary() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        """Always write to the primary."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between objects of any alias, as they all hold the same data."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Only migrate the primary."""
+        return db == DEFAULT_DB_ALIAS
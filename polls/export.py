@@ -0,0 +1,138 @@
+"""Streaming export of the votes and tallies as CSV or NDJSON."""
+import csv
+import itertools
+import json
+
+from asgiref.sync import sync_to_async
+
+from .models import Ballot, BallotType, Choice, Question, Vote
+from .tally import unpack
+
+CHUNK_SIZE = 2000
+
+VOTE_COLUMNS = ('id', 'question_id', 'choice_id', 'user_id')
+TALLY_COLUMNS = ('question_id', 'question_text', 'choice_id', 'choice_text', 'votes')
+BALLOT_COLUMNS = ('id', 'question_id', 'user_id', 'choice_ids')
+
+
+class _Echo:
+    """File-like object that returns what is written, so csv.writer formats one row at a time."""
+
+    def write(self, value):
+        return value
+
+
+class CSVFormat:
+    """Rows as CSV with a header line."""
+
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def __init__(self, columns):
+        """Format rows of ``columns``."""
+        self.columns = columns
+        self.writer = csv.writer(_Echo())
+
+    def header(self):
+        """Return the header line."""
+        return self.writer.writerow(self.columns)
+
+    def row(self, values):
+        """Return one row as a CSV line, with lists joined by ``|`` as import_polls reads the choices."""
+        return self.writer.writerow(['|'.join(map(str, value)) if isinstance(value, list) else value
+                                     for value in values])
+
+
+class NDJSONFormat:
+    """Rows as one JSON object per line."""
+
+    extension = 'ndjson'
+    content_type = 'application/x-ndjson'
+
+    def __init__(self, columns):
+        """Format rows of ``columns``."""
+        self.columns = columns
+
+    def header(self):
+        """NDJSON has no header line."""
+        return ''
+
+    def row(self, values):
+        """Return one row as a JSON line."""
+        return json.dumps(dict(zip(self.columns, values))) + '\n'
+
+
+FORMATS = {'csv': CSVFormat, 'ndjson': NDJSONFormat}
+
+
+def _ballot_tallies(question_ids):
+    # Approval and ranked questions have no vote counters: their ballots
+    # are tallied, one question at a time.
+    questions = Question.objects.select_related('snapshot').exclude(
+        ballot_type=BallotType.PLURALITY).order_by('pk')
+    if question_ids:
+        questions = questions.filter(pk__in=question_ids)
+    for question in list(questions):
+        choices, _ = question.results()
+        for choice in choices:
+            yield question.pk, question.question_text, choice.pk, choice.choice_text, choice.vote_count
+
+
+def rows(question_ids=None, tallies=False, ballots=False, chunk_size=CHUNK_SIZE):
+    """
+    Return the columns and the rows of an export.
+
+    Args:
+        question_ids: Only export these questions; all of them when empty.
+        tallies: Export the vote count of every choice instead of the votes.
+        ballots: Export the ballots of the approval and ranked questions
+            instead of the votes of the plurality ones.
+        chunk_size: The number of rows read from the database at a time.
+
+    Returns:
+        tuple: The column names and an iterator of the rows, read with
+        ``QuerySet.iterator()`` so the memory used does not grow with the
+        number of rows.
+    """
+    if tallies:
+        columns = TALLY_COLUMNS
+        queryset = Choice.objects.filter(question__ballot_type=BallotType.PLURALITY).order_by(
+            'question_id', 'pk').values_list('question_id', 'question__question_text', 'pk', 'choice_text',
+                                             'vote_count')
+    elif ballots:
+        columns = BALLOT_COLUMNS
+        queryset = Ballot.objects.order_by('pk').values_list('pk', 'question_id', 'user_id', 'preferences')
+    else:
+        columns = VOTE_COLUMNS
+        queryset = Vote.objects.order_by('pk').values_list('pk', 'question_id', 'choice_id', 'user_id')
+    if question_ids:
+        queryset = queryset.filter(question_id__in=question_ids)
+    values = queryset.iterator(chunk_size=chunk_size)
+    if tallies:
+        values = itertools.chain(values, _ballot_tallies(question_ids))
+    elif ballots:
+        values = ((pk, question_id, user_id, unpack(preferences)) for pk, question_id, user_id, preferences in values)
+    return columns, values
+
+
+def lines(format, question_ids=None, tallies=False, chunk_size=CHUNK_SIZE, ballots=False):
+    """Yield an export of rows() in chunks of ``chunk_size`` lines."""
+    columns, values_iterator = rows(question_ids, tallies, ballots, chunk_size)
+    formatter = FORMATS[format](columns)
+    chunk = [formatter.header()]
+    for values in values_iterator:
+        chunk.append(formatter.row(values))
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+async def alines(format, question_ids=None, tallies=False, chunk_size=CHUNK_SIZE, ballots=False):
+    """Async version of lines(), for streaming responses served under ASGI."""
+    # QuerySet.aiterator() of Django 4.2 runs values_list() queries in the
+    # event loop, so the chunks of lines() are read in a thread instead.
+    chunks = lines(format, question_ids, tallies, chunk_size, ballots)
+    read = sync_to_async(next)
+    while (chunk := await read(chunks, None)) is not None:
+        yield chunk
@@ -0,0 +1,96 @@
+"""Freeze the results of closed polls and optionally archive their votes."""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from polls import cache, export
+from polls.models import BallotType, Choice, Question, ResultSnapshot, Vote, VoteArchive
+
+
+def snapshot_choice(choice):
+    """Return the entry of ``ResultSnapshot.choices`` of a counted choice."""
+    data = {'id': choice.pk, 'choice_text': choice.choice_text, 'votes': choice.vote_count}
+    if hasattr(choice, 'rounds'):
+        data.update(rounds=choice.rounds, winner=choice.winner)
+    return data
+
+
+def close_question(question, archive=None, archive_dir=None):
+    """
+    Write the final tally of a closed question and optionally move its votes out of ``Vote``.
+
+    The counters are recounted from the votes first, so the snapshot is exact
+    even if they had drifted. With ``archive`` set to ``'table'`` the votes are
+    copied to ``VoteArchive``, with ``'file'`` they are written as CSV to
+    ``<archive_dir>/question-<pk>.csv``; in both cases they are then deleted.
+    Approval and ranked questions are snapshot from their ballots.
+
+    Returns:
+        ResultSnapshot: The snapshot of the question.
+    """
+    with transaction.atomic():
+        if question.ballot_type == BallotType.PLURALITY:
+            counts = dict(Vote.objects.filter(question=question, choice__isnull=False)
+                          .values('choice').annotate(n=Count('pk')).values_list('choice', 'n'))
+            choices = list(question.choice_set.order_by('pk'))
+            for choice in choices:
+                choice.vote_count = counts.get(choice.pk, 0)
+            Choice.objects.bulk_update(choices, ['vote_count'])
+            total = sum(counts.values())
+            Question.objects.filter(pk=question.pk).update(total_votes=total)
+        else:
+            # Approval and ranked questions are counted from their ballots, which are kept.
+            choices, total = question.tally()
+        snapshot = ResultSnapshot.objects.create(question=question, total_votes=total,
+                                                 choices=[snapshot_choice(choice) for choice in choices])
+        if archive == 'table':
+            VoteArchive.objects.bulk_create(
+                VoteArchive(question_id=question_id, choice_id=choice_id, user_id=user_id)
+                for question_id, choice_id, user_id in
+                Vote.objects.filter(question=question).values_list('question_id', 'choice_id', 'user_id')
+                .iterator(chunk_size=export.CHUNK_SIZE))
+        elif archive == 'file':
+            with open(Path(archive_dir) / 'question-{}.csv'.format(question.pk), 'w', newline='') as file:
+                for chunk in export.lines('csv', [question.pk]):
+                    file.write(chunk)
+        if archive:
+            # One statement instead of the per-row signals of QuerySet.delete().
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {} WHERE question_id = %s'.format(
+                    connection.ops.quote_name(Vote._meta.db_table)), [question.pk])
+                snapshot.archived_votes = cursor.rowcount
+            snapshot.save(update_fields=['archived_votes'])
+    # The counters were updated in bulk, without the signals that bump the cached pages.
+    cache.bump(cache.question_version_key(question.pk), cache.tally_version_key(question.pk))
+    return snapshot
+
+
+class Command(BaseCommand):
+    """Snapshot the results of every closed poll that has no snapshot yet."""
+
+    help = ('Freeze the results of the closed polls (or the given ones) into ResultSnapshot, '
+            'optionally archiving their votes. Polls closed before are skipped, so it can run from cron.')
+
+    def add_arguments(self, parser):
+        """Accept an optional list of question ids and where to archive the votes."""
+        parser.add_argument('question_ids', nargs='*', type=int, help='Only close these questions.')
+        parser.add_argument('--archive', choices=['table', 'file'],
+                            help='Move the votes to the VoteArchive table or to CSV files, then delete them.')
+        parser.add_argument('--archive-dir', default='.', help='Directory of the CSV files of --archive file.')
+
+    def handle(self, *args, **options):
+        """Close the polls one transaction at a time."""
+        if options['archive'] == 'file' and not Path(options['archive_dir']).is_dir():
+            raise CommandError('{} is not a directory.'.format(options['archive_dir']))
+        questions = Question.objects.filter(end_date__lte=timezone.now(), snapshot__isnull=True).order_by('pk')
+        if options['question_ids']:
+            questions = questions.filter(pk__in=options['question_ids'])
+        closed = archived = 0
+        for question in questions:
+            snapshot = close_question(question, options['archive'], options['archive_dir'])
+            closed += 1
+            archived += snapshot.archived_votes
+        self.stdout.write(self.style.SUCCESS('Closed {} question(s), archived {} vote(s).'.format(closed, archived)))
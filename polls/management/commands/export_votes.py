@@ -0,0 +1,38 @@
+"""Export the votes or the tallies of the polls as CSV or NDJSON."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls import export
+
+
+class Command(BaseCommand):
+    """Stream the votes, or the vote count of every choice, to a file or stdout."""
+
+    help = 'Export the votes of every question (or the given ones) as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        """Accept an optional list of question ids and the format of the export."""
+        parser.add_argument('question_ids', nargs='*', type=int, help='Only export these questions.')
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='csv')
+        parser.add_argument('--tallies', action='store_true',
+                            help='Export the vote count of every choice instead of the votes.')
+        parser.add_argument('--ballots', action='store_true',
+                            help='Export the ballots of the approval and ranked questions instead of the votes.')
+        parser.add_argument('--output', help='Write to this file instead of stdout.')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE,
+                            help='Rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        """Write the export one chunk at a time."""
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        chunks = export.lines(options['format'], options['question_ids'], options['tallies'], options['chunk_size'],
+                              ballots=options['ballots'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        self.stdout.write(self.style.SUCCESS('Exported to {}.'.format(options['output'])))
@@ -0,0 +1,183 @@
+"""Import questions and their choices from CSV, JSON or NDJSON files."""
+import csv
+import itertools
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from polls import cache
+from polls.models import BallotType, Choice, Question
+
+# Fields an import updates on existing questions. Not ballot_type: votes are
+# Vote rows or Ballot rows depending on it, so a switch would drop them from
+# the tally.
+QUESTION_FIELDS = ('question_text', 'pub_date', 'end_date')
+
+
+class InvalidRow(ValueError):
+    """Raised for a row that cannot be imported."""
+
+
+def read_rows(path, format, separator):
+    """
+    Yield the polls of a file as dicts.
+
+    JSON files hold a list of objects and NDJSON files one object per line,
+    each with ``question_text``, ``pub_date``, ``end_date``, ``choices`` (a
+    list of texts), an optional ``external_id`` and an optional
+    ``ballot_type`` (plurality by default). CSV files have the same
+    columns, with the choices in one column separated by ``separator``.
+    NDJSON lines that are not JSON are yielded as InvalidRow errors, which
+    clean() raises, so they are reported like the other invalid rows.
+    """
+    with open(path, newline='') as file:
+        if format == 'json':
+            try:
+                polls = json.load(file)
+            except ValueError as error:
+                raise CommandError('{} is not valid JSON: {}'.format(path, error))
+            yield from polls
+        elif format == 'ndjson':
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as error:
+                        yield InvalidRow('Not valid JSON: {}.'.format(error))
+        else:
+            for row in csv.DictReader(file):
+                row['choices'] = [text for text in (row.get('choices') or '').split(separator) if text.strip()]
+                yield row
+
+
+def parse_date(value, field):
+    """Return an aware datetime from an ISO 8601 string, in the current time zone if it has none."""
+    try:
+        date = parse_datetime(value or '')
+    except (TypeError, ValueError):
+        date = None
+    if date is None:
+        raise InvalidRow('{} is not a valid date: {!r}.'.format(field, value))
+    return timezone.make_aware(date) if timezone.is_naive(date) else date
+
+
+def clean(row):
+    """
+    Validate a row and return its question, with the texts of its choices.
+
+    Raises:
+        InvalidRow: If a field is missing or invalid, or ``row`` is the
+            InvalidRow error of an unreadable line.
+    """
+    if isinstance(row, InvalidRow):
+        raise row
+    if not isinstance(row, dict):
+        raise InvalidRow('A poll must be an object.')
+    text = row.get('question_text') or ''
+    if not isinstance(text, str) or not text.strip() or len(text.strip()) > 200:
+        raise InvalidRow('question_text must have 1 to 200 characters.')
+    text = text.strip()
+    pub_date = parse_date(row.get('pub_date'), 'pub_date')
+    end_date = parse_date(row.get('end_date'), 'end_date')
+    if end_date <= pub_date:
+        raise InvalidRow('end_date must be after pub_date.')
+    choices = row.get('choices') or []
+    if not isinstance(choices, list) or not all(isinstance(choice, str) for choice in choices):
+        raise InvalidRow('choices must be a list of 1 to 200 character texts.')
+    choices = [choice.strip() for choice in choices]
+    if not choices or not all(0 < len(choice) <= 200 for choice in choices):
+        raise InvalidRow('choices must be a list of 1 to 200 character texts.')
+    external_id = row.get('external_id')
+    if not isinstance(external_id, (str, int, type(None))) or isinstance(external_id, bool):
+        raise InvalidRow('external_id must be a text or a number.')
+    external_id = str(external_id if external_id is not None else '').strip() or None
+    if external_id and len(external_id) > 100:
+        raise InvalidRow('external_id must have at most 100 characters.')
+    ballot_type = row.get('ballot_type') or BallotType.PLURALITY
+    if not isinstance(ballot_type, str) or ballot_type not in BallotType.values:
+        raise InvalidRow('ballot_type must be one of {}.'.format(', '.join(BallotType.values)))
+    question = Question(question_text=text, pub_date=pub_date, end_date=end_date, external_id=external_id,
+                        ballot_type=ballot_type)
+    return question, list(dict.fromkeys(choices))
+
+
+def import_batch(polls):
+    """
+    Insert or update a batch of polls in one transaction.
+
+    Questions with an ``external_id`` are upserted on it: an existing
+    question gets the new text and dates, and the choices it does not have
+    yet. Choices are never removed and the ballot type never changes, so
+    the votes cast are kept.
+
+    Returns:
+        tuple: The number of questions created and updated.
+    """
+    if not polls:
+        return 0, 0
+    keyed = {question.external_id: (question, choices) for question, choices in polls if question.external_id}
+    unkeyed = [(question, choices) for question, choices in polls if not question.external_id]
+    with transaction.atomic():
+        existing = set(Question.objects.filter(external_id__in=keyed).values_list('external_id', flat=True))
+        Question.objects.bulk_create([question for question, _ in keyed.values()], update_conflicts=True,
+                                     unique_fields=['external_id'], update_fields=QUESTION_FIELDS)
+        pks = dict(Question.objects.filter(external_id__in=keyed).values_list('external_id', 'pk'))
+        Question.objects.bulk_create([question for question, _ in unkeyed])
+        have = set(Choice.objects.filter(question__in=[pks[key] for key in existing])
+                   .values_list('question_id', 'choice_text'))
+        new_choices = [(pks[key], text) for key, (_, choices) in keyed.items() for text in choices]
+        new_choices += [(question.pk, text) for question, choices in unkeyed for text in choices]
+        Choice.objects.bulk_create([Choice(question_id=question_id, choice_text=text)
+                                    for question_id, text in new_choices if (question_id, text) not in have])
+    # Bulk writes send no signals, so the cached pages are bumped here.
+    question_ids = [*pks.values(), *(question.pk for question, _ in unkeyed)]
+    cache.bump(cache.LIST_VERSION_KEY, *[key for pk in question_ids
+                                         for key in (cache.question_version_key(pk), cache.tally_version_key(pk))])
+    return len(keyed) - len(existing) + len(unkeyed), len(existing)
+
+
+class Command(BaseCommand):
+    """Create or update polls in bulk from files."""
+
+    help = ('Import questions and their choices from CSV, JSON or NDJSON files, '
+            'updating the questions whose external_id was imported before.')
+
+    def add_arguments(self, parser):
+        """Accept the files and the size of the batches."""
+        parser.add_argument('files', nargs='+', help='Files to import; the format is guessed from the extension.')
+        parser.add_argument('--format', choices=['csv', 'json', 'ndjson'], help='Format of every file.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Polls inserted per transaction.')
+        parser.add_argument('--choice-separator', default='|', help='Separator of the choices column of CSV files.')
+
+    def handle(self, *args, **options):
+        """Import the files batch by batch and report the rate."""
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        start = time.perf_counter()
+        rows = created = updated = skipped = 0
+        for path in options['files']:
+            format = options['format'] or Path(path).suffix.lstrip('.').lower()
+            if format not in ('csv', 'json', 'ndjson'):
+                raise CommandError('Cannot tell the format of {}, use --format.'.format(path))
+            numbered = enumerate(read_rows(path, format, options['choice_separator']), 1)
+            while batch := list(itertools.islice(numbered, options['batch_size'])):
+                polls = []
+                for number, row in batch:
+                    try:
+                        polls.append(clean(row))
+                    except InvalidRow as error:
+                        skipped += 1
+                        self.stderr.write('{}: row {}: {}'.format(path, number, error))
+                rows += len(batch)
+                batch_created, batch_updated = import_batch(polls)
+                created += batch_created
+                updated += batch_updated
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {} row(s): {} created, {} updated, {} skipped in {:.2f}s ({:.0f} rows/s).'.format(
+                rows, created, updated, skipped, elapsed, rows / elapsed if elapsed else 0)))
@@ -0,0 +1,26 @@
+"""Rebuild the denormalized vote counters from the Vote table."""
+
+from django.core.management.base import BaseCommand
+
+from polls import cache
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Repair drifted ``Choice.vote_count`` and ``Question.total_votes`` counters."""
+
+    help = 'Recount the votes of every question (or the given ones) from the Vote table.'
+
+    def add_arguments(self, parser):
+        """Accept an optional list of question ids."""
+        parser.add_argument('question_ids', nargs='*', type=int, help='Only recount these questions.')
+
+    def handle(self, *args, **options):
+        """Recount the votes in two bulk UPDATE statements."""
+        questions = Question.objects.all()
+        if options['question_ids']:
+            questions = questions.filter(pk__in=options['question_ids'])
+        count = questions.recount_votes()
+        # The counters were updated in bulk, without the signals that bump the cached tallies.
+        cache.bump(*[cache.tally_version_key(pk) for pk in questions.values_list('pk', flat=True)])
+        self.stdout.write(self.style.SUCCESS('Recounted votes of {} question(s).'.format(count)))
@@ -0,0 +1,19 @@
+"""Roll up the votes cast since the last run into hourly counts."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls import rollup
+
+
+class Command(BaseCommand):
+    """Update ``VoteRollup`` from the votes changed since its watermark."""
+
+    help = 'Recount the hourly vote counts of the votes cast or changed since the last run. Meant for cron.'
+
+    def handle(self, *args, **options):
+        """Roll up once and report the hours recounted."""
+        start = time.perf_counter()
+        hours = rollup.roll_up()
+        self.stdout.write(self.style.SUCCESS('Recounted {} hour(s) in {:.2f}s.'.format(
+            hours, time.perf_counter() - start)))
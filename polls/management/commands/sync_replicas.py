@@ -0,0 +1,31 @@
+"""Copy the primary SQLite database to its SQLite read replicas."""
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    """Refresh SQLite replicas with the online backup API, for running with replicas locally."""
+
+    help = ('Copy the primary SQLite database to every SQLite replica of POLLS_DATABASE_REPLICAS. '
+            'Run it in a loop to mimic replication.')
+
+    def handle(self, *args, **options):
+        """Back up the primary into each replica file."""
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite databases can be copied; replicate other databases with their own tools.')
+        primary.ensure_connection()
+        for alias in settings.POLLS_DATABASE_REPLICAS:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError('{} is not an SQLite database.'.format(alias))
+            # Close the connection of this process so the file is not in use while it is replaced.
+            replica.close()
+            with sqlite3.connect(replica.settings_dict['NAME']) as target:
+                primary.connection.backup(target)
+            target.close()
+            self.stdout.write('Copied {} to {}.'.format(primary.settings_dict['NAME'], alias))
+        self.stdout.write(self.style.SUCCESS('Synced {} replica(s).'.format(len(settings.POLLS_DATABASE_REPLICAS))))
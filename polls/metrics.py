@@ -0,0 +1,79 @@
+"""Per-view request metrics, rendered in the Prometheus text format."""
+import threading
+
+from . import cache
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative histogram of observed values with fixed bucket bounds."""
+
+    def __init__(self, buckets):
+        """Create an empty histogram."""
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        """Add one value."""
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        """Return the Prometheus text lines of this histogram."""
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count))
+        lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, self.count))
+        lines.append('{}_sum{{{}}} {}'.format(name, labels, round(self.sum, 6)))
+        lines.append('{}_count{{{}}} {}'.format(name, labels, self.count))
+        return lines
+
+
+HISTOGRAMS = (
+    ('polls_request_duration_seconds', 'Wall time of the requests.', DURATION_BUCKETS),
+    ('polls_request_db_queries', 'Database queries of the requests.', QUERY_BUCKETS),
+    ('polls_request_db_duration_seconds', 'Time the requests spent in the database.', DURATION_BUCKETS),
+)
+
+_lock = threading.Lock()
+_views = {}
+
+
+def observe(view, duration, queries, db_duration):
+    """Record one request of a view."""
+    with _lock:
+        histograms = _views.get(view)
+        if histograms is None:
+            histograms = _views[view] = [Histogram(buckets) for _, _, buckets in HISTOGRAMS]
+        for histogram, value in zip(histograms, (duration, queries, db_duration)):
+            histogram.observe(value)
+
+
+def reset():
+    """Forget every recorded request."""
+    with _lock:
+        _views.clear()
+
+
+def render():
+    """Return every metric of this process in the Prometheus text format."""
+    lines = []
+    with _lock:
+        for i, (name, help_text, _) in enumerate(HISTOGRAMS):
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} histogram'.format(name))
+            for view in sorted(_views):
+                lines.extend(_views[view][i].render(name, 'view="{}"'.format(view)))
+    for outcome, count in cache.stats().items():
+        name = 'polls_cache_{}_total'.format(outcome)
+        lines.append('# HELP {} Poll cache {}.'.format(name, outcome))
+        lines.append('# TYPE {} counter'.format(name))
+        lines.append('{} {}'.format(name, count))
+    return '\n'.join(lines) + '\n'
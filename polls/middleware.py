@@ -0,0 +1,207 @@
+"""Middleware of the polls application."""
+import contextlib
+import json
+import logging
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+
+from . import auth, db, metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+
+class QueryTimer:
+    """Database execute wrapper that counts the queries and their time."""
+
+    def __init__(self):
+        """Start with no queries."""
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Run one query and time it."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Record the wall time, query count and database time of every request.
+
+    The numbers go into per-view histograms (see polls.metrics), and requests
+    slower than POLLS_SLOW_REQUEST_MS are logged as one JSON line.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Keep the next handler."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Time the request and the queries it runs on every database."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with self.wrap_connections(timer):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        """Time the request of an async handler."""
+        timer = QueryTimer()
+        start = time.perf_counter()
+        # The wrappers are installed on the connections of this thread, which
+        # sync_to_async runs the queries of the request in.
+        stack = await sync_to_async(self.wrap_connections)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    @staticmethod
+    def wrap_connections(timer):
+        """Return an exit stack with ``timer`` wrapped around every database connection."""
+        stack = contextlib.ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    def record(self, request, response, duration, timer):
+        """Observe the request in the histograms and log it if it was slow."""
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.observe(view, duration, timer.count, timer.duration)
+        if duration * 1000 >= settings.POLLS_SLOW_REQUEST_MS:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'db_queries': timer.count,
+                'db_duration_ms': round(timer.duration * 1000, 1),
+            }))
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware that reads the user from the per-process cache of polls.auth."""
+
+    def process_request(self, request):
+        """Set a lazy ``request.user`` that is only looked up when used."""
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: auth.get_user(request))
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Read from the primary database for the requests that must see recent writes.
+
+    Requests with an unsafe method (votes, logins, signups, admin changes)
+    read from the primary, and their response sets a cookie that sends the
+    reads of the same browser to the primary for POLLS_REPLICA_PIN_SECONDS,
+    so the results page a voter is redirected to already counts the vote
+    while the replicas catch up.
+    """
+
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'polls_primary'
+
+    def __init__(self, get_response):
+        """Keep the next handler."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Run the request against the primary when it writes or follows a write."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.pinned(request):
+            return self.get_response(request)
+        with db.use_primary():
+            response = self.get_response(request)
+        return self.stick(request, response)
+
+    async def __acall__(self, request):
+        """Async version of __call__(); sync_to_async carries the pin to the query threads."""
+        if not self.pinned(request):
+            return await self.get_response(request)
+        with db.use_primary():
+            response = await self.get_response(request)
+        return self.stick(request, response)
+
+    def pinned(self, request):
+        """Tell whether the reads of ``request`` must go to the primary."""
+        return bool(settings.POLLS_DATABASE_REPLICAS) and (
+            request.method not in ('GET', 'HEAD', 'OPTIONS') or self.cookie_name in request.COOKIES)
+
+    def stick(self, request, response):
+        """Pin the next requests of the browser after a write."""
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(self.cookie_name, '1', max_age=settings.POLLS_REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses of at least POLLS_COMPRESS_MIN_BYTES with brotli or gzip.
+
+    Brotli is used when the client accepts it and the ``brotli`` package is
+    installed, except for streaming responses and for pages that embed a
+    CSRF token (the CSRF middleware sets its cookie on them): those get
+    GZipMiddleware, which pads its output against BREACH. Event streams are
+    never compressed, as the compressor would hold the events back.
+    """
+
+    def process_response(self, request, response):
+        """Compress the response if it is worth it and the client accepts it."""
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        if not response.streaming and len(response.content) < settings.POLLS_COMPRESS_MIN_BYTES:
+            return response
+        if (brotli is None or response.streaming or response.has_header('Content-Encoding')
+                or settings.CSRF_COOKIE_NAME in response.cookies
+                or not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))):
+            return super().process_response(request, response)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.POLLS_BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # As GZipMiddleware, keep a strong ETag usable for conditional requests by making it weak.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_votes(apps, schema_editor):
+    """Fill the new counters from the existing Vote rows."""
+    Question = apps.get_model('polls', 'Question')
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    choice_votes = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(n=Count('pk')).values('n')
+    question_votes = Vote.objects.filter(question=OuterRef('pk'), choice__isnull=False).values(
+        'question').annotate(n=Count('pk')).values('n')
+    Choice.objects.update(vote_count=Coalesce(Subquery(choice_votes), 0))
+    Question.objects.update(total_votes=Coalesce(Subquery(question_votes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_auto_20201104_2309'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='total_votes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_votes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:02
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """Keep only the latest vote of each user on each question, then recount."""
+    Question = apps.get_model('polls', 'Question')
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    duplicates = Vote.objects.values('question', 'user').annotate(n=Count('pk'), last=Max('pk')).filter(n__gt=1)
+    for row in duplicates:
+        Vote.objects.filter(question=row['question'], user=row['user']).exclude(pk=row['last']).delete()
+    choice_votes = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(n=Count('pk')).values('n')
+    question_votes = Vote.objects.filter(question=OuterRef('pk'), choice__isnull=False).values(
+        'question').annotate(n=Count('pk')).values('n')
+    Choice.objects.update(vote_count=Coalesce(Subquery(choice_votes), 0))
+    Question.objects.update(total_votes=Coalesce(Subquery(question_votes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_vote_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('question', 'user'), name='polls_vote_unique_question_user'),
+        ),
+    ]
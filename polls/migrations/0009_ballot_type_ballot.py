@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0008_vote_timestamps_voterollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='ballot_type',
+            field=models.CharField(choices=[('plurality', 'One choice'), ('approval', 'Any number of choices'), ('ranked', 'Ranked choices, instant runoff')], default='plurality', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preferences', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ballot',
+            constraint=models.UniqueConstraint(fields=('question', 'user'), name='polls_ballot_unique_question_user'),
+        ),
+    ]
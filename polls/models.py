@@ -3,21 +3,87 @@
 import datetime
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, CharField, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from .tally import approval, decode, irv, pack, unpack
 
 # from django.contrib.auth import User
 
 # Create your models here.
 
 
+class BallotType(models.TextChoices):
+    """How the users of a question vote and how their votes are counted."""
+
+    PLURALITY = 'plurality', 'One choice'
+    APPROVAL = 'approval', 'Any number of choices'
+    RANKED = 'ranked', 'Ranked choices, instant runoff'
+
+
+class QuestionQuerySet(models.QuerySet):
+    """Queries shared by every set of questions."""
+
+    def with_status(self, now):
+        """Annotate each question with its ``status`` at ``now``: 'upcoming', 'open' or 'closed'."""
+        return self.annotate(status=Case(
+            When(pub_date__gt=now, then=Value('upcoming')),
+            When(end_date__gt=now, then=Value('open')),
+            default=Value('closed'),
+            output_field=CharField(),
+        ))
+
+    def filter_status(self, status, now):
+        """Keep the questions that have the given ``status`` at ``now``, as range lookups the index can serve."""
+        lookups = {
+            'upcoming': Q(pub_date__gt=now),
+            'open': Q(pub_date__lte=now, end_date__gt=now),
+            'closed': Q(pub_date__lte=now, end_date__lte=now),
+        }
+        return self.filter(lookups[status])
+
+    def after(self, pub_date, pk):
+        """Return the questions that follow (pub_date, pk) in newest first order."""
+        return self.filter(Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)).order_by('-pub_date', '-pk')
+
+    def recount_votes(self):
+        """
+        Rebuild the vote counters of these questions and their choices from ``Vote``.
+
+        Returns:
+            int: The number of questions recounted.
+        """
+        choice_votes = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(n=Count('pk')).values('n')
+        question_votes = Vote.objects.filter(question=OuterRef('pk'), choice__isnull=False).values(
+            'question').annotate(n=Count('pk')).values('n')
+        # The votes of archived polls are gone; their counters are final.
+        # Approval and ranked questions have ballots instead of counters.
+        questions = self.exclude(snapshot__archived_votes__gt=0).filter(ballot_type=BallotType.PLURALITY)
+        Choice.objects.filter(question__in=questions).update(vote_count=Coalesce(Subquery(choice_votes), 0))
+        return questions.update(total_votes=Coalesce(Subquery(question_votes), 0))
+
+
 class Question(models.Model):
     """A model class that contains a method about question in polls."""
 
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField("date published")
     end_date = models.DateTimeField("end date")
+    total_votes = models.IntegerField(default=0)
+    # Key of the question in the files of `manage.py import_polls`.
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    # Plurality votes are Vote rows; approval and ranked votes are Ballot rows.
+    ballot_type = models.CharField(max_length=10, choices=BallotType.choices, default=BallotType.PLURALITY)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The index page filters and orders on pub_date and checks end_date.
+            models.Index(fields=['pub_date', 'end_date'], name='polls_question_pub_end_idx'),
+        ]
 
     def __str__(self):
         """Given readable string representation of an object."""
@@ -54,19 +120,307 @@ class Question(models.Model):
     was_published_recently.boolean = True
     was_published_recently.short_description = 'Published recently?'
 
+    def tally(self):
+        """
+        Read the vote counters of every choice of this question in one query.
+
+        Approval and ranked questions are counted from their ballots instead,
+        see _tally_ballots().
+
+        Returns:
+            tuple: The list of choices, each annotated with ``percentage``,
+            and the total number of votes.
+        """
+        choices = list(self.choice_set.order_by('pk'))
+        if self.ballot_type == BallotType.PLURALITY:
+            return self._tally(choices)
+        return self._tally_ballots(choices, list(self.ballot_set.values_list('preferences', flat=True)))
+
+    async def atally(self):
+        """Async version of tally()."""
+        choices = [choice async for choice in self.choice_set.order_by('pk')]
+        if self.ballot_type == BallotType.PLURALITY:
+            return self._tally(choices)
+        return self._tally_ballots(
+            choices, [preferences async for preferences in self.ballot_set.values_list('preferences', flat=True)])
+
+    def results(self):
+        """
+        Return the tally() of the question, read from its ResultSnapshot once the poll is closed.
+
+        Load the question with ``select_related('snapshot')`` to read a
+        missing snapshot without a query.
+        """
+        if self.end_date <= timezone.now():
+            try:
+                return self.snapshot.tally()
+            except ResultSnapshot.DoesNotExist:
+                pass
+        return self.tally()
+
+    def is_frozen(self):
+        """
+        Check if the results of the question are frozen in a ResultSnapshot.
+
+        Load the question with ``select_related('snapshot')`` to check
+        without a query.
+        """
+        try:
+            return self.snapshot is not None
+        except ResultSnapshot.DoesNotExist:
+            return False
+
+    async def aresults(self):
+        """Async version of results()."""
+        if self.end_date <= timezone.now():
+            try:
+                snapshot = (self.snapshot if Question.snapshot.is_cached(self)
+                            else await ResultSnapshot.objects.aget(pk=self.pk))
+                return snapshot.tally()
+            except ResultSnapshot.DoesNotExist:
+                pass
+        return await self.atally()
+
+    @staticmethod
+    def _tally(choices, total=None):
+        if total is None:
+            total = sum(choice.vote_count for choice in choices)
+        for choice in choices:
+            choice.percentage = round(100 * choice.vote_count / total, 1) if total else 0
+        return choices, total
+
+    def _tally_ballots(self, choices, preferences):
+        """
+        Count packed ballots with polls.tally.
+
+        ``vote_count`` is the number of ballots approving a choice, or the
+        votes of a ranked choice in the last round of the instant runoff;
+        ranked choices also get their count in every round as ``rounds``
+        and ``winner``. The total is the number of ballots.
+        """
+        matrix = decode(preferences, [choice.pk for choice in choices])
+        if self.ballot_type == BallotType.APPROVAL:
+            for choice, count in zip(choices, approval(matrix, len(choices)).tolist()):
+                choice.vote_count = count
+        else:
+            result = irv(matrix, len(choices))
+            for position, choice in enumerate(choices):
+                choice.rounds = [counts[position] for counts in result.rounds]
+                choice.vote_count = choice.rounds[-1]
+                choice.winner = position == result.winner
+        return self._tally(choices, len(preferences))
+
 
 class Choice(models.Model):
     """A choice model class."""
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.IntegerField(default=0)
 
     def __str__(self):
         """Given readable string representation of an object."""
         return self.choice_text
 
 
+class VoteQuerySet(models.QuerySet):
+    """Queries shared by every set of votes."""
+
+    def choices_of(self, user, question_ids):
+        """
+        Return the choices of ``user`` on the given questions in one query.
+
+        Returns:
+            dict: The id of the chosen choice by question id, for the
+            questions the user voted on. Empty for anonymous users, without
+            a query.
+        """
+        if not user.is_authenticated or not question_ids:
+            return {}
+        return dict(self.filter(user=user, question__in=question_ids).values_list('question_id', 'choice_id'))
+
+    def record(self, question, user, choice):
+        """
+        Record the vote of a user on a question, replacing their previous choice.
+
+        The vote row is created or updated under the (question, user) unique
+        constraint inside one transaction together with the vote counters, so
+        concurrent submissions of the same user never create duplicates or
+        count twice.
+
+        Returns:
+            tuple: The vote and True if it is a new vote, False if it replaced
+            an earlier one.
+        """
+        with transaction.atomic():
+            # Write first: it takes the write lock (row lock on PostgreSQL,
+            # database lock on SQLite) before the vote row is read.
+            Choice.objects.filter(pk=choice.pk).update(vote_count=F('vote_count') + 1)
+            vote, created = self.select_for_update().get_or_create(
+                question=question, user=user, defaults={'choice': choice})
+            if created:
+                Question.objects.filter(pk=question.pk).update(total_votes=F('total_votes') + 1)
+            elif vote.choice_id == choice.pk:
+                Choice.objects.filter(pk=choice.pk).update(vote_count=F('vote_count') - 1)
+            else:
+                Choice.objects.filter(pk=vote.choice_id).update(vote_count=F('vote_count') - 1)
+                vote.choice = choice
+                vote.save(update_fields=['choice', 'updated_at'])
+        return vote, created
+
+
 class Vote(models.Model):
-    question = models.ForeignKey(Question, blank=True, null=True, on_delete=models.CASCADE)
+    """The choice of one user on one question."""
+
+    # Indexed by the (question, user) and (question, choice) indexes below.
+    question = models.ForeignKey(Question, blank=True, null=True, on_delete=models.CASCADE, db_index=False)
     choice = models.ForeignKey(Choice, blank=True, null=True, on_delete=models.CASCADE)
     user = models.ForeignKey(User, blank=True, null=True, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set by every change of choice; polls.rollup reads the votes changed since its watermark.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = VoteQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'user'], name='polls_vote_unique_question_user'),
+        ]
+        indexes = [
+            # Covers per-question tallies grouped by choice without reading the table.
+            models.Index(fields=['question', 'choice'], name='polls_vote_question_choice_idx'),
+            # Covers the recount of the hours of a question by polls.rollup.
+            models.Index(fields=['question', 'created_at'], name='polls_vote_question_time_idx'),
+        ]
+
+
+class BallotQuerySet(models.QuerySet):
+    """Queries shared by every set of ballots."""
+
+    def choices_of(self, user, question_ids):
+        """
+        Return the choices of ``user`` on the given questions in one query.
+
+        Returns:
+            dict: The ids of the chosen choices by question id, in order of
+            preference for ranked questions. Empty for anonymous users,
+            without a query.
+        """
+        if not user.is_authenticated or not question_ids:
+            return {}
+        return {question_id: unpack(preferences) for question_id, preferences in self.filter(
+            user=user, question__in=question_ids).values_list('question_id', 'preferences')}
+
+    def cast(self, question, user, choices):
+        """
+        Record the ballot of a user on an approval or ranked question, replacing their previous one.
+
+        Args:
+            choices: The approved choices, or the ranked choices in order of
+                preference.
+
+        Returns:
+            tuple: The ballot and True if it is a new ballot, False if it
+            replaced an earlier one.
+        """
+        preferences = pack(choice.pk for choice in choices)
+        with transaction.atomic():
+            # Write first, as in VoteQuerySet.record().
+            Question.objects.filter(pk=question.pk).update(total_votes=F('total_votes'))
+            ballot, created = self.select_for_update().get_or_create(
+                question=question, user=user, defaults={'preferences': preferences})
+            if created:
+                Question.objects.filter(pk=question.pk).update(total_votes=F('total_votes') + 1)
+            else:
+                ballot.preferences = preferences
+                ballot.save(update_fields=['preferences', 'updated_at'])
+        return ballot, created
+
+
+class Ballot(models.Model):
+    """
+    The ballot of one user on an approval or ranked question.
+
+    The choices are one packed array per ballot (see polls.tally.pack) rather
+    than one row per choice, so a tally reads one row per voter.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    preferences = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BallotQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also the index of the ballots of a question.
+            models.UniqueConstraint(fields=['question', 'user'], name='polls_ballot_unique_question_user'),
+        ]
+
+    def __str__(self):
+        """Given readable string representation of an object."""
+        return 'Ballot of {} on {}'.format(self.user_id, self.question_id)
+
+    def choice_ids(self):
+        """Return the ids of the chosen choices, in order of preference for ranked questions."""
+        return unpack(self.preferences)
+
+
+class ResultSnapshot(models.Model):
+    """The final tally of a closed poll, written by `manage.py close_polls`."""
+
+    question = models.OneToOneField(Question, primary_key=True, on_delete=models.CASCADE, related_name='snapshot')
+    total_votes = models.IntegerField()
+    # [{"id": choice id, "choice_text": text, "votes": count}, ...] in choice order,
+    # with the "rounds" and "winner" of the choices of ranked questions.
+    choices = models.JSONField()
+    archived_votes = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Given readable string representation of an object."""
+        return 'Results of {}'.format(self.question_id)
+
+    def tally(self):
+        """Return the frozen tally in the shape of Question.tally(), with unsaved choices."""
+        choices = []
+        for data in self.choices:
+            choice = Choice(pk=data['id'], question_id=self.question_id, choice_text=data['choice_text'],
+                            vote_count=data['votes'])
+            if 'rounds' in data:
+                choice.rounds, choice.winner = data['rounds'], data['winner']
+            choices.append(choice)
+        return Question._tally(choices, self.total_votes)
+
+
+class VoteArchive(models.Model):
+    """A vote of a closed poll, moved out of ``Vote`` by `manage.py close_polls --archive table`."""
+
+    question_id = models.IntegerField(db_index=True)
+    choice_id = models.IntegerField(null=True)
+    user_id = models.IntegerField(null=True)
+
+
+class VoteRollup(models.Model):
+    """The number of votes cast on a choice during one hour, kept up to date by polls.rollup."""
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, db_index=False)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    # The start of the hour, in UTC.
+    bucket_hour = models.DateTimeField()
+    count = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the index of the timeline of a question.
+            models.UniqueConstraint(fields=['question', 'bucket_hour', 'choice'], name='polls_voterollup_unique_hour'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """The time up to which the changes of a table were rolled up."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()
@@ -0,0 +1,61 @@
+"""Signal receivers of the polls application."""
+
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import auth, cache, stream
+from .models import Ballot, Choice, Question, Vote
+
+
+def _bump(*keys):
+    # Bump now for this transaction and again on commit, so a page cached by
+    # another request before the commit is not served afterwards.
+    cache.bump(*keys)
+    transaction.on_commit(lambda: cache.bump(*keys))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Invalidate the cached question, its tally and the index pages."""
+    _bump(cache.question_version_key(instance.pk), cache.tally_version_key(instance.pk), cache.LIST_VERSION_KEY)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    """Invalidate the cached question and tally of the choice."""
+    _bump(cache.question_version_key(instance.question_id), cache.tally_version_key(instance.question_id))
+
+
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+def vote_changed(sender, instance, **kwargs):
+    """Invalidate the cached tally of the voted question and the choices of the voter, and push the tally."""
+    _bump(cache.tally_version_key(instance.question_id), cache.voted_version_key(instance.user_id))
+    transaction.on_commit(lambda: stream.notify(instance.question_id))
+
+
+@receiver(post_save, sender=Ballot)
+@receiver(post_delete, sender=Ballot)
+def ballot_changed(sender, instance, **kwargs):
+    """Invalidate the cached tally of the question and the choices of the voter, and push the tally."""
+    _bump(cache.tally_version_key(instance.question_id), cache.voted_version_key(instance.user_id))
+    transaction.on_commit(lambda: stream.notify(instance.question_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Drop the user from the user cache, so a changed password or deactivation applies at once."""
+    auth.forget(instance.pk)
+
+
+@receiver(user_logged_out)
+def logged_out(sender, request, user, **kwargs):
+    """Drop the user that logged out from the user cache."""
+    if user is not None:
+        auth.forget(user.pk)
@@ -0,0 +1,204 @@
+"""Live results of a question pushed to its watchers over Server-Sent Events."""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = ': heartbeat\n\n'
+
+_broadcasters = {}
+_clients = 0
+_lock = threading.Lock()
+
+
+class ClientLimitReached(Exception):
+    """Raised when a process already streams to POLLS_STREAM_MAX_CLIENTS watchers."""
+
+
+def format_event(event, data):
+    """Return one Server-Sent Event with ``data`` encoded as JSON."""
+    return 'event: {}\ndata: {}\n\n'.format(event, json.dumps(data))
+
+
+def snapshot_event(question, choices, total):
+    """Return the ``snapshot`` event of a tally, as returned by Question.tally()."""
+    return format_event('snapshot', {
+        'question': question.pk,
+        'total_votes': total,
+        'choices': [{'id': choice.pk, 'text': choice.choice_text, 'votes': choice.vote_count,
+                     'percentage': choice.percentage} for choice in choices],
+    })
+
+
+class Broadcaster:
+    """
+    Fan-out of the tally of one question to its watchers on one event loop.
+
+    A change is tallied once for every watcher: the broadcaster reads the
+    cached tally and pushes a ``delta`` event with the new vote counts of
+    the choices that changed. Every heartbeat it sends a comment line and
+    re-reads the tally, which also picks up votes recorded by other
+    processes or by the vote buffer.
+
+    Each watcher has a bounded queue. When a slow watcher lets its queue
+    fill up, its backlog is dropped and replaced with a fresh ``snapshot``
+    event, so it catches up without the broadcaster ever waiting on it.
+    """
+
+    def __init__(self, question, loop):
+        """Start tallying ``question`` and beating on ``loop``."""
+        self.question = question
+        self.loop = loop
+        self.subscribers = set()
+        self.counts = {}
+        self.snapshot = None
+        self._dirty = False
+        self._refresh = None
+        self.ready = loop.create_task(self.refresh())
+        self._heartbeat = loop.create_task(self._beat())
+
+    def subscribe(self):
+        """Return a new queue of the events of this question."""
+        queue = asyncio.Queue(maxsize=settings.POLLS_STREAM_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def publish(self, message):
+        """Queue ``message`` for every watcher without waiting for any of them."""
+        for queue in self.subscribers:
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.snapshot)
+            else:
+                queue.put_nowait(message)
+
+    def notify(self):
+        """Tally the question again soon; calls made before the tally is read are merged."""
+        self._dirty = True
+        if self._refresh is None or self._refresh.done():
+            self._refresh = self.loop.create_task(self._refresh_while_dirty())
+
+    async def _refresh_while_dirty(self):
+        while self._dirty:
+            self._dirty = False
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Could not tally question %s for its watchers.", self.question.pk)
+
+    async def refresh(self):
+        """Read the tally and publish the vote counts that changed since the last read."""
+        choices, total = await cache.aget_tally(self.question)
+        counts = {choice.pk: choice.vote_count for choice in choices}
+        previous, self.counts = self.counts, counts
+        self.snapshot = snapshot_event(self.question, choices, total)
+        if previous.keys() != counts.keys():
+            if previous:
+                self.publish(self.snapshot)
+        elif previous != counts:
+            self.publish(format_event('delta', {
+                'total_votes': total,
+                'choices': [{'id': pk, 'votes': votes} for pk, votes in counts.items() if previous[pk] != votes],
+            }))
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(settings.POLLS_STREAM_HEARTBEAT_SECONDS)
+            self.publish(HEARTBEAT)
+            self.notify()
+
+    def close(self):
+        """Stop tallying and beating."""
+        self._heartbeat.cancel()
+        if self._refresh is not None:
+            self._refresh.cancel()
+
+
+def subscribe(question):
+    """
+    Start watching the results of ``question`` from the running event loop.
+
+    Returns:
+        tuple: The broadcaster of the question and the queue of its events.
+
+    Raises:
+        ClientLimitReached: This process already streams to
+            POLLS_STREAM_MAX_CLIENTS watchers.
+    """
+    global _clients
+    loop = asyncio.get_running_loop()
+    with _lock:
+        if _clients >= settings.POLLS_STREAM_MAX_CLIENTS:
+            raise ClientLimitReached()
+        _clients += 1
+        broadcaster = _broadcasters.get((loop, question.pk))
+        if broadcaster is None:
+            broadcaster = _broadcasters[loop, question.pk] = Broadcaster(question, loop)
+        return broadcaster, broadcaster.subscribe()
+
+
+def is_full():
+    """Tell whether this process already streams to POLLS_STREAM_MAX_CLIENTS watchers."""
+    with _lock:
+        return _clients >= settings.POLLS_STREAM_MAX_CLIENTS
+
+
+def unsubscribe(broadcaster, queue):
+    """Stop watching, closing the broadcaster once nobody watches its question."""
+    global _clients
+    with _lock:
+        _clients -= 1
+        broadcaster.subscribers.discard(queue)
+        if not broadcaster.subscribers:
+            del _broadcasters[broadcaster.loop, broadcaster.question.pk]
+            broadcaster.close()
+
+
+def notify(question_id):
+    """Tell the watchers of a question in this process that its votes changed; safe from any thread."""
+    with _lock:
+        broadcasters = [broadcaster for (_, pk), broadcaster in _broadcasters.items() if pk == question_id]
+    for broadcaster in broadcasters:
+        try:
+            broadcaster.loop.call_soon_threadsafe(broadcaster.notify)
+        except RuntimeError:
+            # The event loop was closed.
+            pass
+
+
+async def events(question):
+    """
+    Yield the snapshot of the results of ``question``, then their changes and heartbeats.
+
+    The watcher is only subscribed once the stream is read, so a response
+    that is never sent takes no client slot; a stream that finds the
+    process full ends at once. The stream ends after
+    POLLS_STREAM_MAX_SECONDS; the ``retry`` field makes the browser
+    reconnect, which also bounds the life of streams whose client went away
+    unnoticed.
+    """
+    try:
+        broadcaster, queue = subscribe(question)
+    except ClientLimitReached:
+        return
+    try:
+        await asyncio.shield(broadcaster.ready)
+        yield 'retry: {}\n{}'.format(settings.POLLS_STREAM_RETRY_MS, broadcaster.snapshot)
+        deadline = broadcaster.loop.time() + settings.POLLS_STREAM_MAX_SECONDS
+        while True:
+            timeout = deadline - broadcaster.loop.time()
+            if timeout <= 0:
+                return
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return
+    finally:
+        unsubscribe(broadcaster, queue)
@@ -0,0 +1,169 @@
+"""Tallies of approval and ranked ballots, computed with NumPy."""
+import collections
+import struct
+
+import numpy as np
+
+# Preferences are packed as little-endian unsigned 32-bit choice ids.
+PREFERENCE = struct.Struct('<I')
+
+# Widest range of choice ids mapped to positions with a lookup table.
+MAX_LOOKUP_SPAN = 1 << 20
+
+IRVResult = collections.namedtuple('IRVResult', ['rounds', 'eliminated', 'winner'])
+IRVResult.__doc__ = """
+The rounds of an instant-runoff count.
+
+``rounds`` holds the vote count of every choice in each round (0 once the
+choice is eliminated), ``eliminated`` the choices in the order they were
+eliminated and ``winner`` the winning choice, or None without ballots.
+Choices are given by their position in the list of choices.
+"""
+
+
+def pack(choice_ids):
+    """Return the preferences of a ballot as bytes."""
+    return b''.join(PREFERENCE.pack(choice_id) for choice_id in choice_ids)
+
+
+def unpack(preferences):
+    """Return the choice ids packed by pack()."""
+    return [choice_id for choice_id, in PREFERENCE.iter_unpack(bytes(preferences))]
+
+
+def positions(packed, choice_ids):
+    """Return the position in ``choice_ids`` of every packed choice id, or -1 for unknown ids."""
+    ids = np.asarray(choice_ids, dtype=np.int64)
+    low, span = int(ids.min()), int(ids.max() - ids.min()) + 1
+    if span <= MAX_LOOKUP_SPAN:
+        # A table indexed by id, with a last entry of -1 for ids out of range.
+        lookup = np.full(span + 1, -1, dtype=np.int32)
+        lookup[ids - low] = np.arange(len(ids))
+        offsets = packed.astype(np.int64) - low
+        offsets[(offsets < 0) | (offsets >= span)] = span
+        return lookup[offsets]
+    order = np.argsort(ids)
+    found = np.searchsorted(ids[order], packed).clip(max=len(ids) - 1)
+    return np.where(ids[order][found] == packed, order[found], -1)
+
+
+def decode(ballots, choice_ids):
+    """
+    Load packed ballots into a matrix of choice positions.
+
+    Args:
+        ballots: A list of packed preferences, as made by pack().
+        choice_ids: The ids of the choices of the question.
+
+    Returns:
+        numpy.ndarray: One row per ballot with the positions in
+        ``choice_ids`` of its choices, padded with -1. Choices that are not
+        in ``choice_ids`` any more are -1 too.
+    """
+    lengths = np.fromiter(map(len, ballots), dtype=np.int64, count=len(ballots)) // PREFERENCE.size
+    matrix = np.full((len(ballots), int(lengths.max(initial=0))), -1, dtype=np.int32)
+    packed = np.frombuffer(b''.join(ballots), dtype='<u4')
+    if packed.size and len(choice_ids):
+        # The cells of each row up to its length, in row-major order like the packed ids.
+        matrix[np.arange(matrix.shape[1]) < lengths[:, None]] = positions(packed, choice_ids)
+    return matrix
+
+
+def approval(matrix, candidates):
+    """Return the number of ballots approving each of ``candidates`` choices."""
+    return np.bincount(matrix[matrix >= 0], minlength=candidates)[:candidates]
+
+
+def _loser(rounds, remaining):
+    # The fewest votes, ties broken by the fewest votes in the rounds before,
+    # then by the last choice.
+    tied = remaining
+    for counts in reversed(rounds):
+        fewest = min(counts[choice] for choice in tied)
+        tied = [choice for choice in tied if counts[choice] == fewest]
+        if len(tied) == 1:
+            break
+    return tied[-1]
+
+
+def irv(matrix, candidates):
+    """
+    Count ranked ballots by instant runoff.
+
+    Each round counts every ballot for its highest ranked choice still in
+    the running. A choice with more than half of those votes wins;
+    otherwise the choice with the fewest votes is eliminated (see _loser)
+    and only the ballots that were counted for it move to their next
+    choice, so a round costs a pass over those ballots and one bincount.
+
+    Args:
+        matrix: Ballots as returned by decode().
+        candidates: The number of choices.
+
+    Returns:
+        IRVResult: The rounds, in the same form as irv_python().
+    """
+    exhausted = candidates
+    # -1 padding and unknown choices become a sentinel that is never running.
+    ranks = np.where(matrix < 0, exhausted, matrix)
+    running = np.ones(candidates + 1, dtype=bool)
+    running[exhausted] = False
+
+    def top_choices(rows):
+        valid = running[ranks[rows]]
+        first = valid.argmax(axis=1)
+        return np.where(valid.any(axis=1), ranks[rows, first], exhausted)
+
+    top = top_choices(np.arange(len(ranks))) if ranks.shape[1] else np.full(len(ranks), exhausted)
+    counts = np.bincount(top, minlength=candidates + 1)
+    rounds, eliminated = [], []
+    while True:
+        rounds.append(counts[:candidates].tolist())
+        continuing = len(top) - counts[exhausted]
+        remaining = np.flatnonzero(running[:candidates]).tolist()
+        if not continuing or not remaining:
+            return IRVResult(rounds, eliminated, None)
+        leader = max(remaining, key=lambda choice: counts[choice])
+        if 2 * counts[leader] > continuing or len(remaining) == 1:
+            return IRVResult(rounds, eliminated, leader)
+        loser = _loser(rounds, remaining)
+        running[loser] = False
+        eliminated.append(loser)
+        moved = np.flatnonzero(top == loser)
+        top[moved] = top_choices(moved)
+        counts = counts + np.bincount(top[moved], minlength=candidates + 1)
+        counts[loser] = 0
+
+
+def irv_python(ballots, candidates):
+    """
+    Reference instant-runoff count in pure Python, with the rules of irv().
+
+    Args:
+        ballots: A list of ballots, each a list of choice positions in order
+            of preference.
+        candidates: The number of choices.
+
+    Returns:
+        IRVResult: The rounds of the count.
+    """
+    running = set(range(candidates))
+    rounds, eliminated = [], []
+    while True:
+        counts = [0] * candidates
+        for ballot in ballots:
+            for choice in ballot:
+                if choice in running:
+                    counts[choice] += 1
+                    break
+        rounds.append(counts)
+        continuing = sum(counts)
+        remaining = sorted(running)
+        if not continuing or not remaining:
+            return IRVResult(rounds, eliminated, None)
+        leader = max(remaining, key=lambda choice: counts[choice])
+        if 2 * counts[leader] > continuing or len(remaining) == 1:
+            return IRVResult(rounds, eliminated, leader)
+        loser = _loser(rounds, remaining)
+        running.discard(loser)
+        eliminated.append(loser)
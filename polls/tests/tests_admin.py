@@ -0,0 +1,101 @@
+"""Test cases for the admin site."""
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.admin import CappedCountPaginator
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + abs(datetime.timedelta(days=days))
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class VoteAdminTests(TestCase):
+    """A vote and question admin tests."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='Himitsu')
+        self.client.force_login(self.admin)
+        self.question = create_question(question_text='Admin question.', days=-5)
+        self.choice = self.question.choice_set.create(choice_text='Admin choice')
+
+    def add_votes(self, count):
+        users = User.objects.bulk_create([User(username='voter{}-{}'.format(count, i)) for i in range(count)])
+        Vote.objects.bulk_create([Vote(question=self.question, choice=self.choice, user=user) for user in users])
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('admin:polls_vote_changelist')).status_code, 200)
+        return len(queries)
+
+    def test_vote_changelist_query_count(self):
+        """The vote changelist runs as many queries for 3 votes as for 30."""
+        self.add_votes(3)
+        # The first request also loads the session and the user.
+        self.changelist_queries()
+        few = self.changelist_queries()
+        self.add_votes(30)
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_vote_form_without_selects(self):
+        """The vote form does not list every user and choice."""
+        self.add_votes(3)
+        response = self.client.get(reverse('admin:polls_vote_add'))
+        self.assertNotContains(response, 'voter3-0')
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+
+    def test_question_changelist_totals(self):
+        """The question changelist shows the vote total of every question."""
+        self.add_votes(3)
+        Question.objects.recount_votes()
+        response = self.client.get(reverse('admin:polls_question_changelist'))
+        self.assertContains(response, '<td class="field-total_votes">3</td>', html=True)
+
+    def test_capped_count(self):
+        """The paginator stops counting at its cap."""
+        self.add_votes(5)
+        paginator = CappedCountPaginator(Vote.objects.order_by('pk'), 2)
+        paginator.count_cap = 4
+        self.assertEqual(paginator.count, 4)
+
+    def test_pages_past_cap(self):
+        """Pages past the capped count are still served, with a link to the next one."""
+        self.add_votes(5)
+        paginator = CappedCountPaginator(Vote.objects.order_by('pk'), 2)
+        paginator.count_cap = 2
+        self.assertEqual(paginator.num_pages, 1)
+        self.assertEqual(len(paginator.page(2)), 2)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertEqual(len(paginator.page(3)), 1)
+        self.assertEqual(paginator.num_pages, 3)
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+
+    def test_changelist_past_cap(self):
+        """The vote changelist shows the capped count as a lower bound and serves the pages past it."""
+        self.add_votes(5)
+        with mock.patch.object(CappedCountPaginator, 'count_cap', 3), \
+                mock.patch('polls.admin.VoteAdmin.list_per_page', 2):
+            url = reverse('admin:polls_vote_changelist')
+            self.assertContains(self.client.get(url), '3+ votes')
+            response = self.client.get(url, {'p': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 1)
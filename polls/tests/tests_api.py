@@ -0,0 +1,102 @@
+"""Test cases for the JSON API."""
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class QuestionAPITests(TestCase):
+    """A JSON API tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(question_text='Open question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.closed = create_question(question_text='Closed question.', days=-10, duration=5)
+        self.future = create_question(question_text='Future question.', days=5)
+        self.user = User.objects.create_user('Miko')
+
+    def test_list(self):
+        """The list has the published questions and answers a matching ETag with 304."""
+        url = reverse('polls:api_questions')
+        response = self.client.get(url)
+        self.assertEqual([question['question_text'] for question in response.json()['results']],
+                         ['Open question.', 'Closed question.'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, {'status': 'closed'}).json()['results'][0]['status'], 'closed')
+
+    def test_list_skips_voted(self):
+        """The list does not read the choices of a logged in user, which it does not show."""
+        self.client.force_login(self.user)
+        url = reverse('polls:api_questions')
+        self.client.get(url)
+        with mock.patch('polls.cache.get_voted') as get_voted, self.assertNumQueries(0):
+            self.client.get(url)
+        get_voted.assert_not_called()
+
+    def test_detail(self):
+        """The detail of a question lists its choices."""
+        data = self.client.get(reverse('polls:api_question', args=(self.question.id,))).json()
+        self.assertEqual(data['status'], 'open')
+        self.assertEqual([choice['choice_text'] for choice in data['choices']], ['First', 'Second'])
+
+    def test_unpublished(self):
+        """A question not published yet is not found."""
+        response = self.client.get(reverse('polls:api_question', args=(self.future.id,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_results_not_modified_without_tally(self):
+        """A conditional request for unchanged results is answered with 304 after one query and no tally."""
+        Vote.objects.record(self.question, self.user, self.first)
+        url = reverse('polls:api_results', args=(self.question.id,))
+        response = self.client.get(url)
+        self.assertEqual((response.json()['total_votes'], response.json()['choices'][0]['percentage']), (1, 100.0))
+        with mock.patch.object(Question, 'tally', side_effect=AssertionError), self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_vote_changes_etag(self):
+        """A vote gives the results a new ETag."""
+        url = reverse('polls:api_results', args=(self.question.id,))
+        etag = self.client.get(url)['ETag']
+        Vote.objects.record(self.question, self.user, self.second)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_votes'], 1)
+
+    def test_vote_of_another_process_changes_etag(self):
+        """A vote that did not bump the cache of this process, as one recorded by another worker, changes the ETag."""
+        url = reverse('polls:api_results', args=(self.question.id,))
+        response = self.client.get(url)
+        with mock.patch('polls.cache.bump'):
+            Vote.objects.record(self.question, self.user, self.second)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_closed_cached_long(self):
+        """The results of a closed poll may be cached by clients and proxies."""
+        response = self.client.get(reverse('polls:api_results', args=(self.closed.id,)))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
@@ -0,0 +1,96 @@
+"""Test cases for the async views."""
+import datetime
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from polls import async_views, urls
+from polls.models import Question, Vote
+
+# The polls urls with the async views, as mysite/asgi.py serves them.
+ASYNC_VIEWS = {
+    'index': async_views.IndexView.as_view(),
+    'detail': async_views.DetailView.as_view(),
+    'results': async_views.ResultsView.as_view(),
+    'vote': async_views.vote,
+}
+urlpatterns = [
+    path('polls/', include(([path(str(pattern.pattern), ASYNC_VIEWS.get(pattern.name, pattern.callback),
+                                  name=pattern.name) for pattern in urls.urlpatterns], 'polls'))),
+]
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTests(TestCase):
+    """The async views tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(question_text='Async question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.future = create_question(question_text='Future question.', days=5)
+        self.user = User.objects.create_user('Miko', password='Himitsu')
+        self.async_client.force_login(self.user)
+
+    async def test_index(self):
+        """The async index lists the published questions only."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertEqual([question.question_text for question in response.context['latest_question_list']],
+                         ['Async question.'])
+
+    async def test_detail_and_results(self):
+        """The async detail and results pages render the choices and the tally."""
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, 'Second')
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.context['total_votes'], 0)
+
+    async def test_voted(self):
+        """The async index and detail pages show the current choice of the user."""
+        await sync_to_async(Vote.objects.record)(self.question, self.user, self.second)
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertEqual(response.context['latest_question_list'][0].voted_choice_id, self.second.id)
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.context['voted_choice_id'], self.second.id)
+
+    async def test_unpublished_detail(self):
+        """The async detail page of a question not published yet is not found."""
+        response = await self.async_client.get(reverse('polls:detail', args=(self.future.id,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_vote(self):
+        """The async vote view records the vote and updates the counters."""
+        response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)),
+                                                {'choice': self.second.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        vote = await Vote.objects.select_related('choice').aget(user=self.user)
+        self.assertEqual((vote.choice, vote.choice.vote_count), (self.second, 1))
+
+    async def test_vote_requires_login(self):
+        """An anonymous vote is redirected to the login page."""
+        response = await AsyncClient().post(reverse('polls:vote', args=(self.question.id,)),
+                                            {'choice': self.first.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/accounts/login/', response.url)
@@ -0,0 +1,173 @@
+"""Test cases for approval and ranked ballots and their tallies."""
+import csv
+import datetime
+import io
+import json
+import random
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import tally
+from polls.models import Ballot, BallotType, Question
+
+
+def create_question(question_text, days, duration=10, ballot_type=BallotType.PLURALITY):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end, ballot_type=ballot_type))
+
+
+class TallyEngineTests(SimpleTestCase):
+    """A NumPy tally engine tests."""
+
+    def test_pack(self):
+        """Packed preferences unpack to the same choice ids in the same order."""
+        self.assertEqual(tally.unpack(tally.pack([7, 3, 4000000000])), [7, 3, 4000000000])
+
+    def test_decode_unknown_choice(self):
+        """Choices that are not in the list any more are skipped."""
+        matrix = tally.decode([tally.pack([20, 99, 10]), tally.pack([10]), b''], [10, 20])
+        self.assertEqual(matrix.tolist(), [[1, -1, 0], [0, -1, -1], [-1, -1, -1]])
+
+    def test_irv_runoff(self):
+        """The last choice is eliminated and its ballots move to their next choice."""
+        ballots = [[0, 1]] * 4 + [[1, 0]] * 3 + [[2, 1]] * 2
+        result = tally.irv(tally.decode([tally.pack(ballot) for ballot in ballots], [0, 1, 2]), 3)
+        self.assertEqual(result, tally.IRVResult([[4, 3, 2], [4, 5, 0]], [2], 1))
+
+    def test_irv_matches_reference(self):
+        """The NumPy count gives the rounds of the pure-Python reference."""
+        rng = random.Random(7)
+        for _ in range(100):
+            candidates = rng.randint(1, 6)
+            ballots = [rng.sample(range(candidates), rng.randint(0, candidates)) for _ in range(rng.randint(0, 40))]
+            matrix = tally.decode([tally.pack(ballot) for ballot in ballots], list(range(candidates)))
+            self.assertEqual(tally.irv(matrix, candidates), tally.irv_python(ballots, candidates))
+
+    def test_approval(self):
+        """Approval counts every approved choice of every ballot."""
+        matrix = tally.decode([tally.pack([1, 2]), tally.pack([2]), tally.pack([])], [1, 2, 3])
+        self.assertEqual(tally.approval(matrix, 3).tolist(), [1, 2, 0])
+
+
+class BallotTests(TestCase):
+    """Approval and ranked question tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('Miko', password='Himitsu')
+        self.client.force_login(self.user)
+
+    def create(self, ballot_type):
+        question = create_question(question_text='Ballot question.', days=-1, ballot_type=ballot_type)
+        choices = [question.choice_set.create(choice_text=text) for text in ('Red', 'Green', 'Blue')]
+        return question, choices
+
+    def test_ranked_vote(self):
+        """A ranked vote stores one packed ballot and replaces the earlier one."""
+        question, (red, green, blue) = self.create(BallotType.RANKED)
+        url = reverse('polls:vote', args=(question.id,))
+        response = self.client.post(url, {'choice': [str(blue.id), '', str(red.id)]})
+        self.assertRedirects(response, reverse('polls:results', args=(question.id,)))
+        self.client.post(url, {'choice': [str(green.id), str(blue.id)]})
+        ballot = Ballot.objects.get(question=question, user=self.user)
+        self.assertEqual(ballot.choice_ids(), [green.id, blue.id])
+        question.refresh_from_db()
+        self.assertEqual(question.total_votes, 1)
+
+    def test_ranked_duplicate(self):
+        """A choice ranked twice is refused."""
+        question, (red, _, _) = self.create(BallotType.RANKED)
+        response = self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': [red.id, red.id]})
+        self.assertContains(response, 'Each choice can only be ranked once.')
+        self.assertFalse(Ballot.objects.exists())
+
+    def test_ranked_results(self):
+        """The results page shows the instant-runoff rounds and the winner."""
+        question, (red, green, blue) = self.create(BallotType.RANKED)
+        rankings = [[red, green]] * 4 + [[green, red]] * 3 + [[blue, green]] * 2
+        for number, ranking in enumerate(rankings):
+            Ballot.objects.cast(question, User.objects.create_user('voter{}'.format(number)), ranking)
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        choices = response.context['choices']
+        self.assertEqual([choice.rounds for choice in choices], [[4, 4], [3, 5], [2, 0]])
+        self.assertEqual([choice.winner for choice in choices], [False, True, False])
+        self.assertEqual(response.context['total_votes'], 9)
+        self.assertContains(response, '(winner)', count=1)
+
+    def test_approval_results(self):
+        """Approval results count the ballots approving each choice."""
+        question, (red, green, blue) = self.create(BallotType.APPROVAL)
+        self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': [red.id, blue.id]})
+        Ballot.objects.cast(question, User.objects.create_user('other'), [blue])
+        choices, total = question.tally()
+        self.assertEqual(([choice.vote_count for choice in choices], total), ([1, 0, 2], 2))
+        self.assertEqual(choices[2].percentage, 100.0)
+
+    def test_closed_snapshot(self):
+        """Closing a ranked poll freezes its rounds."""
+        question, (red, green, _) = self.create(BallotType.RANKED)
+        Ballot.objects.cast(question, self.user, [green, red])
+        Question.objects.filter(pk=question.pk).update(end_date=timezone.now() - datetime.timedelta(hours=1))
+        call_command('close_polls', stdout=io.StringIO())
+        question = Question.objects.select_related('snapshot').get(pk=question.pk)
+        choices, total = question.results()
+        self.assertEqual(([choice.rounds for choice in choices], total), ([[0], [1], [0]], 1))
+        self.assertTrue(choices[1].winner)
+
+    def test_voted_approval(self):
+        """The index and the detail form show the approved choices of the user."""
+        question, (red, green, blue) = self.create(BallotType.APPROVAL)
+        self.assertNotContains(self.client.get(reverse('polls:index')), '(you voted)')
+        self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': [red.id, blue.id]})
+        self.assertContains(self.client.get(reverse('polls:index')), '(you voted)')
+        response = self.client.get(reverse('polls:detail', args=(question.id,)))
+        self.assertEqual(response.context['voted_choice_ids'], [red.id, blue.id])
+        self.assertContains(response, 'checked', count=2)
+
+    def test_voted_ranked(self):
+        """The detail form preselects the ranking of the user."""
+        question, (red, green, blue) = self.create(BallotType.RANKED)
+        Ballot.objects.cast(question, self.user, [blue, red])
+        response = self.client.get(reverse('polls:detail', args=(question.id,)))
+        self.assertEqual(response.context['ranks'], [blue.id, red.id, None])
+        self.assertContains(response, 'selected', count=2)
+
+    def test_export_ballots(self):
+        """The ballots export lists the chosen choices of every ballot."""
+        question, (red, green, blue) = self.create(BallotType.RANKED)
+        Ballot.objects.cast(question, self.user, [green, red])
+        out = io.StringIO()
+        call_command('export_votes', '--ballots', stdout=out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ['id', 'question_id', 'user_id', 'choice_ids'])
+        self.assertEqual(rows[1][1:], [str(question.id), str(self.user.id), '{}|{}'.format(green.id, red.id)])
+
+    def test_export_tallies(self):
+        """The tallies export counts the ballots of approval questions."""
+        question, (red, green, blue) = self.create(BallotType.APPROVAL)
+        Ballot.objects.cast(question, self.user, [red, blue])
+        out = io.StringIO()
+        call_command('export_votes', '--tallies', '--format', 'ndjson', str(question.id), stdout=out)
+        votes = [json.loads(line)['votes'] for line in out.getvalue().splitlines()]
+        self.assertEqual(votes, [1, 0, 1])
+
+    def test_no_timeline(self):
+        """Approval and ranked questions have no timeline."""
+        question, _ = self.create(BallotType.APPROVAL)
+        response = self.client.get(reverse('polls:results_timeline', args=(question.id,)))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,162 @@
+"""Test cases for the write-behind vote buffer."""
+import datetime
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import buffer
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class VoteBufferTests(TestCase):
+    """A write-behind vote buffer tests."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.buffer = buffer.VoteBuffer(self.directory.name)
+        self.question = create_question(question_text='Buffered question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.users = [User.objects.create_user('voter{}'.format(i)) for i in range(3)]
+
+    def assertCounts(self, first, second, total):
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count, self.question.total_votes),
+                         (first, second, total))
+
+    def test_flush_records_batch(self):
+        """A flush records every spooled ballot with the last one of each user winning."""
+        self.buffer.add(self.question.pk, self.users[0].pk, self.first.pk)
+        self.buffer.add(self.question.pk, self.users[1].pk, self.first.pk)
+        self.buffer.add(self.question.pk, self.users[0].pk, self.second.pk)
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertCounts(1, 1, 2)
+        self.assertEqual(Vote.objects.get(user=self.users[0]).choice, self.second)
+        self.assertEqual(list(Path(self.directory.name).iterdir()), [])
+
+    def test_flush_switches_existing_vote(self):
+        """A buffered ballot replaces a vote recorded earlier."""
+        Vote.objects.record(self.question, self.users[0], self.first)
+        self.buffer.add(self.question.pk, self.users[0].pk, self.second.pk)
+        self.buffer.flush()
+        self.assertCounts(0, 1, 1)
+
+    def test_foreign_choice_dropped(self):
+        """A ballot for a choice of another question is not recorded."""
+        other = create_question(question_text='Other question.', days=-1).choice_set.create(choice_text='Other')
+        self.buffer.add(self.question.pk, self.users[0].pk, other.pk)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_replay_orphaned_spool(self):
+        """Ballots spooled by a process that died are recorded on startup."""
+        with open(Path(self.directory.name) / '999999999.spool', 'w') as spool:
+            spool.write(json.dumps([self.question.pk, self.users[2].pk, self.first.pk]) + '\n')
+        self.buffer.adopt_orphans()
+        self.buffer.flush()
+        self.assertCounts(1, 0, 1)
+
+    def test_orphan_taken_by_another_worker(self):
+        """An orphan adopted by another worker first, or not named after a process, is skipped."""
+        directory = Path(self.directory.name)
+        (directory / 'notes.spool').touch()
+        (directory / '999999999.spool').touch()
+        rename = Path.rename
+
+        def taken(path, target):
+            if path.name == '999999999.spool':
+                raise FileNotFoundError(path)
+            return rename(path, target)
+
+        with mock.patch.object(Path, 'rename', taken), self.assertLogs('polls.buffer', 'WARNING'):
+            self.buffer.adopt_orphans()
+        self.assertEqual(sorted(path.name for path in directory.iterdir()), ['999999999.spool', 'notes.spool'])
+
+    def test_malformed_lines_skipped(self):
+        """Truncated or foreign lines of a batch are skipped, the ballots around them are recorded."""
+        with open(Path(self.directory.name) / '999999999.spool', 'w') as spool:
+            spool.write(json.dumps([self.question.pk, self.users[0].pk, self.first.pk]) + '\n')
+            spool.write('{"question": 1}\n[1, 2]\n')
+            spool.write(json.dumps([self.question.pk, self.users[1].pk, self.second.pk]) + '\n')
+            spool.write('[{}, {}, '.format(self.question.pk, self.users[2].pk))
+        self.buffer.adopt_orphans()
+        with self.assertLogs('polls.buffer', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertCounts(1, 1, 2)
+
+    def test_failing_batch_set_aside(self):
+        """A batch that keeps failing is renamed to .bad and later ballots are still recorded."""
+        self.buffer.add(self.question.pk, self.users[0].pk, self.first.pk)
+        with mock.patch.object(buffer, 'apply_ballots', side_effect=RuntimeError), \
+                self.assertLogs('polls.buffer', 'ERROR'):
+            for _ in range(self.buffer.max_attempts):
+                self.buffer.flush()
+        self.assertEqual([path.suffix for path in Path(self.directory.name).iterdir()], ['.bad'])
+        self.buffer.add(self.question.pk, self.users[1].pk, self.second.pk)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertCounts(0, 1, 1)
+
+    def test_failing_batch_holds_back_later_ones(self):
+        """Batches after a failing one wait for it, so an older ballot never replaces a newer one."""
+        self.buffer.add(self.question.pk, self.users[0].pk, self.first.pk)
+        with mock.patch.object(buffer, 'apply_ballots', side_effect=RuntimeError), \
+                self.assertLogs('polls.buffer', 'ERROR'):
+            self.buffer.flush()
+        self.buffer.add(self.question.pk, self.users[0].pk, self.second.pk)
+        with mock.patch.object(buffer, 'apply_ballots', side_effect=[RuntimeError, 0]) as apply, \
+                self.assertLogs('polls.buffer', 'ERROR'):
+            self.buffer.flush()
+        self.assertEqual(apply.call_count, 1)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(Vote.objects.get(user=self.users[0]).choice, self.second)
+
+    def test_buffer_recreated_after_fork(self):
+        """A forked process starts its own buffer instead of using the one of its parent."""
+        self.addCleanup(setattr, buffer, '_buffer', None)
+        self.buffer.pid = os.getpid() + 1
+        buffer._buffer = self.buffer
+        with override_settings(POLLS_VOTE_BUFFER_DIR=self.directory.name), \
+                mock.patch.object(buffer.VoteBuffer, 'start') as start:
+            fresh = buffer.get_buffer()
+        self.assertIsNot(fresh, self.buffer)
+        self.assertEqual(fresh.pid, os.getpid())
+        start.assert_called_once_with()
+
+    def test_vote_view_spools(self):
+        """With the buffer on, the vote view spools the ballot and redirects at once."""
+        self.client.force_login(self.users[0])
+        self.addCleanup(setattr, buffer, '_buffer', None)
+        buffer._buffer = self.buffer
+        with override_settings(POLLS_VOTE_BUFFER=True):
+            response = self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                                        {'choice': self.first.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.assertFalse(Vote.objects.exists())
+        self.buffer.flush()
+        self.assertCounts(1, 0, 1)
@@ -0,0 +1,73 @@
+"""Test cases for the poll cache."""
+import datetime
+
+from django.core.cache import cache as default_cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import cache
+from polls.models import Question
+
+
+def create_question(question_text, days):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + abs(datetime.timedelta(days=days))
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class PollCacheTests(TestCase):
+    """A poll cache tests."""
+
+    def setUp(self):
+        default_cache.clear()
+        self.question = create_question(question_text='Cached question.', days=-5)
+        self.choice = self.question.choice_set.create(choice_text='Cached choice')
+
+    def test_hits_and_misses(self):
+        """The first read misses, the next ones hit."""
+        before = cache.stats()
+        cache.get_question(self.question.pk)
+        cache.get_question(self.question.pk)
+        cache.get_question(self.question.pk)
+        after = cache.stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 2)
+
+    def test_choice_change_invalidates_question(self):
+        """Editing a choice is visible on the next read of the results page."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.assertContains(self.client.get(url), 'Cached choice')
+        self.choice.choice_text = 'Edited choice'
+        self.choice.save()
+        self.assertContains(self.client.get(url), 'Edited choice')
+
+    def test_new_question_invalidates_index(self):
+        """A new question shows up on the cached index page at once."""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('polls:index'))
+        create_question(question_text='Fresh question.', days=-1)
+        self.assertContains(self.client.get(reverse('polls:index')), 'Fresh question.')
+
+    def test_deleted_question(self):
+        """A deleted question is not served from the cache."""
+        url = reverse('polls:detail', args=(self.question.id,))
+        self.client.get(url)
+        self.question.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_missing_question_not_cached(self):
+        """Unknown ids leave nothing in the cache."""
+        default_cache.clear()
+        for pk in range(1000, 1010):
+            self.assertIsNone(cache.get_question(pk))
+        self.assertEqual(len(default_cache._cache), 0)
@@ -0,0 +1,121 @@
+"""Test cases for response compression and the cache headers of the pages."""
+import datetime
+import gzip
+import io
+import unittest
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.middleware import CompressionMiddleware, brotli
+from polls.models import Question
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """A compression middleware tests."""
+
+    body = b'<p>Which colour do you like best?</p>\n' * 100
+
+    def process(self, response, accept='gzip, deflate, br'):
+        request = RequestFactory().get('/polls/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_gzip(self):
+        """Clients without brotli get gzip."""
+        response = self.process(HttpResponse(self.body), accept='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    @unittest.skipUnless(brotli, 'brotli is not installed')
+    def test_brotli(self):
+        """Clients accepting brotli get it, with a weak ETag."""
+        original = HttpResponse(self.body)
+        original['ETag'] = '"abc"'
+        response = self.process(original)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(self.body) // 10)
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+    def test_csrf_token_not_brotli(self):
+        """Pages setting the CSRF cookie get padded gzip against BREACH."""
+        original = HttpResponse(self.body)
+        original.set_cookie('csrftoken', 'secret')
+        self.assertEqual(self.process(original)['Content-Encoding'], 'gzip')
+
+    @override_settings(POLLS_COMPRESS_MIN_BYTES=10000)
+    def test_small(self):
+        """Responses under POLLS_COMPRESS_MIN_BYTES are left alone."""
+        response = self.process(HttpResponse(self.body))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+
+    def test_event_stream(self):
+        """Event streams are never compressed."""
+        response = self.process(StreamingHttpResponse(iter([b'data: 1\n\n']), content_type='text/event-stream'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), b'data: 1\n\n')
+
+
+class PageCacheHeaderTests(TestCase):
+    """A detail and results cache headers tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(question_text='Cached question.', days=-1)
+        for number in range(20):
+            self.question.choice_set.create(choice_text='Choice number {}'.format(number))
+
+    def test_open_results(self):
+        """The results of an open poll are cached briefly."""
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response['Cache-Control'], 'max-age=5')
+
+    def test_frozen_results(self):
+        """The results of a poll frozen by close_polls are immutable."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(hours=1))
+        call_command('close_polls', stdout=io.StringIO())
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(sorted(response['Cache-Control'].split(', ')),
+                         ['immutable', 'max-age=31536000', 'public'])
+
+    def test_closed_results_without_snapshot(self):
+        """Closed results that may still be recounted are not immutable."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(hours=1))
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_detail_private(self):
+        """The detail page shows the choice of the user, so it is private."""
+        response = self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_etag(self):
+        """A page unchanged since its ETag is answered with 304."""
+        url = reverse('polls:results', args=(self.question.id,))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,25 @@
+"""Test cases for the database connection setup."""
+import unittest
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Checks SQLite PRAGMAs.')
+class SQLiteProfileTests(TransactionTestCase):
+    """The SQLite PRAGMAs of the settings are run on every new connection."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA {}'.format(name))
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'wal', 'synchronous': 'normal',
+                                       'busy_timeout': 1234, 'cache_size': -2000})
+    def test_production_pragmas(self):
+        """A new connection uses WAL, synchronous=NORMAL, the busy timeout and cache size."""
+        connection.close()
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        self.assertEqual(self.pragma('cache_size'), -2000)
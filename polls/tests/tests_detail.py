@@ -1,11 +1,12 @@
 """Test case for detail pages"""
 import datetime
 
+from django.contrib.auth.models import User
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
 
-from polls.models import Question
+from polls.models import Question, Vote
 
 
 def create_question(question_text, days):
@@ -41,3 +42,17 @@ class QuestionDetailViewTests(TestCase):
         url = reverse('polls:detail', args=(past_question.id,))
         response = self.client.get(url)
         self.assertContains(response, past_question.question_text)
+
+    def test_current_choice_checked(self):
+        """The choice the user voted for is selected in the form."""
+        question = create_question(question_text='Voted question.', days=-5)
+        Question.objects.filter(pk=question.pk).update(end_date=timezone.now() + datetime.timedelta(days=5))
+        question.choice_set.create(choice_text='First')
+        second = question.choice_set.create(choice_text='Second')
+        user = User.objects.create_user('voter')
+        Vote.objects.record(question, user, second)
+        self.client.force_login(user)
+        response = self.client.get(reverse('polls:detail', args=(question.id,)))
+        self.assertEqual(response.context['voted_choice_id'], second.id)
+        self.assertContains(response, 'value="{}" checked'.format(second.id))
+        self.assertContains(response, 'checked', count=1)
@@ -0,0 +1,98 @@
+"""Test cases for the export of votes and tallies."""
+import csv
+import datetime
+import io
+import json
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class ExportTests(TestCase):
+    """A votes and tallies export tests."""
+
+    def setUp(self):
+        self.question = create_question(question_text='Exported question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.other = create_question(question_text='Other question.', days=-1)
+        other_choice = self.other.choice_set.create(choice_text='Other')
+        self.users = [User.objects.create_user('voter{}'.format(i)) for i in range(5)]
+        for user in self.users:
+            Vote.objects.record(self.question, user, self.first if user.pk % 2 else self.second)
+        Vote.objects.record(self.other, self.users[0], other_choice)
+        self.staff = User.objects.create_user('staff', password='Himitsu', is_staff=True)
+
+    def export(self, *args):
+        out = io.StringIO()
+        call_command('export_votes', *args, stdout=out)
+        return out.getvalue()
+
+    def test_command_csv(self):
+        """The command exports every vote as CSV, in chunks of any size."""
+        rows = list(csv.reader(io.StringIO(self.export('--chunk-size', '2'))))
+        self.assertEqual(rows[0], ['id', 'question_id', 'choice_id', 'user_id'])
+        self.assertEqual(len(rows), 7)
+
+    def test_command_ndjson_of_question(self):
+        """The command exports the votes of the given questions as NDJSON."""
+        rows = [json.loads(line) for line in self.export(str(self.other.pk), '--format', 'ndjson').splitlines()]
+        self.assertEqual(rows, [{'id': Vote.objects.get(question=self.other).pk, 'question_id': self.other.pk,
+                                 'choice_id': self.other.choice_set.get().pk, 'user_id': self.users[0].pk}])
+
+    def test_command_tallies(self):
+        """With --tallies the command exports the vote count of every choice."""
+        rows = list(csv.DictReader(io.StringIO(self.export(str(self.question.pk), '--tallies'))))
+        self.assertEqual([(row['choice_text'], row['votes']) for row in rows],
+                         [('First', str(self.first.vote_set.count())), ('Second', str(self.second.vote_set.count()))])
+
+    def test_view_staff_only(self):
+        """The export view redirects users who are not staff to the admin login."""
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get(reverse('polls:export')).status_code, 302)
+
+    def test_view_streams(self):
+        """The export view streams the requested rows as an attachment."""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('polls:export'),
+                                   {'format': 'ndjson', 'tallies': '1', 'question': self.question.pk})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('tallies-{}.ndjson'.format(self.question.pk), response['Content-Disposition'])
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(sum(row['votes'] for row in rows), 5)
+
+    def test_view_unknown_format(self):
+        """An unknown format is a bad request."""
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('polls:export'), {'format': 'xml'}).status_code, 400)
+
+    async def test_view_streams_asynchronously(self):
+        """Under ASGI the export view streams with an async iterator."""
+        await sync_to_async(self.async_client.force_login)(self.staff)
+        response = await self.async_client.get(reverse('polls:export'), {'question': self.other.pk})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 2)
@@ -0,0 +1,139 @@
+"""Test cases for the import of polls."""
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from polls.management.commands.import_polls import InvalidRow, clean
+from polls.models import Question, Vote
+
+CSV = """external_id,question_text,pub_date,end_date,choices
+fruit,Best fruit?,2020-01-01T00:00:00,2020-12-31T00:00:00,Apple|Banana
+color,Best color?,2020-01-01T00:00:00+00:00,2020-02-01,Red|Blue|Green
+,Unkeyed question?,2020-01-01T00:00:00,2020-02-01T00:00:00,Yes|No
+dates,Bad dates?,2020-05-01T00:00:00,2020-01-01T00:00:00,A|B
+"""
+
+
+class ImportPollsTests(TestCase):
+    """An import_polls command tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = Path(self.directory.name) / name
+        path.write_text(content)
+        return str(path)
+
+    def import_polls(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_polls', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_csv(self):
+        """The valid rows of a CSV file are imported and the invalid ones reported."""
+        out, err = self.import_polls(self.write('polls.csv', CSV), '--batch-size', '2')
+        self.assertIn('4 row(s): 3 created, 0 updated, 1 skipped', out)
+        self.assertIn('rows/s', out)
+        self.assertIn('row 4: end_date must be after pub_date.', err)
+        color = Question.objects.get(external_id='color')
+        self.assertEqual([choice.choice_text for choice in color.choice_set.order_by('pk')], ['Red', 'Blue', 'Green'])
+        self.assertEqual(Question.objects.get(question_text='Unkeyed question?').choice_set.count(), 2)
+
+    def test_import_is_idempotent(self):
+        """Importing the same file again updates the keyed questions instead of duplicating them."""
+        path = self.write('polls.csv', CSV)
+        self.import_polls(path)
+        out, _ = self.import_polls(path)
+        self.assertIn('1 created, 2 updated', out)
+        self.assertEqual(Question.objects.filter(external_id='fruit').get().choice_set.count(), 2)
+
+    def test_upsert_keeps_votes(self):
+        """An update changes the question and adds new choices, keeping the votes of the old ones."""
+        self.import_polls(self.write('polls.csv', CSV))
+        fruit = Question.objects.get(external_id='fruit')
+        apple = fruit.choice_set.get(choice_text='Apple')
+        Vote.objects.record(fruit, User.objects.create_user('Miko'), apple)
+        path = self.write('polls.json', json.dumps([{
+            'external_id': 'fruit', 'question_text': 'Best fruit ever?', 'pub_date': '2020-01-01T00:00:00',
+            'end_date': '2021-01-01T00:00:00', 'choices': ['Apple', 'Cherry']}]))
+        self.import_polls(path)
+        fruit.refresh_from_db()
+        self.assertEqual(fruit.question_text, 'Best fruit ever?')
+        self.assertEqual(sorted(fruit.choice_set.values_list('choice_text', flat=True)), ['Apple', 'Banana', 'Cherry'])
+        self.assertEqual(fruit.choice_set.get(choice_text='Apple').vote_count, 1)
+
+    def test_upsert_keeps_ballot_type(self):
+        """An update does not switch the ballot type, which would drop the votes from the tally."""
+        self.import_polls(self.write('polls.csv', CSV))
+        fruit = Question.objects.get(external_id='fruit')
+        Vote.objects.record(fruit, User.objects.create_user('Miko'), fruit.choice_set.get(choice_text='Apple'))
+        path = self.write('polls.json', json.dumps([{
+            'external_id': 'fruit', 'question_text': 'Best fruit?', 'pub_date': '2020-01-01T00:00:00',
+            'end_date': '2020-12-31T00:00:00', 'choices': ['Apple', 'Banana'], 'ballot_type': 'ranked'}]))
+        self.import_polls(path)
+        fruit.refresh_from_db()
+        self.assertEqual(fruit.ballot_type, 'plurality')
+        self.assertEqual(fruit.results()[1], 1)
+
+    def test_import_ndjson(self):
+        """NDJSON files hold one poll per line."""
+        lines = [json.dumps({'external_id': 'n{}'.format(i), 'question_text': 'Question {}?'.format(i),
+                             'pub_date': '2020-01-01T00:00:00', 'end_date': '2020-02-01T00:00:00',
+                             'choices': ['Yes', 'No']}) for i in range(5)]
+        self.import_polls(self.write('polls.ndjson', '\n'.join(lines) + '\n'))
+        self.assertEqual(Question.objects.filter(external_id__startswith='n').count(), 5)
+
+    def test_ndjson_bad_line_skipped(self):
+        """An NDJSON line that is not JSON is reported and the other lines are imported."""
+        line = json.dumps({'question_text': 'Fine?', 'pub_date': '2020-01-01T00:00:00',
+                           'end_date': '2020-02-01T00:00:00', 'choices': ['Yes', 'No']})
+        _, err = self.import_polls(self.write('polls.ndjson', line + '\n{"question_text": \n' + line + '\n'))
+        self.assertIn('row 2: Not valid JSON', err)
+        self.assertEqual(Question.objects.filter(question_text='Fine?').count(), 2)
+
+
+class CleanRowTests(SimpleTestCase):
+    """An import row validation tests."""
+
+    row = {'question_text': 'Fine?', 'pub_date': '2020-01-01T00:00:00', 'end_date': '2020-02-01T00:00:00',
+           'choices': ['Yes', 'No']}
+
+    def assertInvalid(self, **fields):
+        with self.assertRaises(InvalidRow):
+            clean({**self.row, **fields})
+
+    def test_valid(self):
+        """A complete row gives an unsaved question and its choices."""
+        question, choices = clean(self.row)
+        self.assertEqual((question.question_text, choices), ('Fine?', ['Yes', 'No']))
+
+    def test_question_text_not_text(self):
+        """A question_text that is not a text is invalid."""
+        self.assertInvalid(question_text=5)
+
+    def test_date_not_text(self):
+        """Dates that are not texts are invalid."""
+        self.assertInvalid(pub_date=5)
+        self.assertInvalid(end_date=['2020-02-01'])
+
+    def test_choices_not_list(self):
+        """Choices must be a list of texts, not one text."""
+        self.assertInvalid(choices='abc')
+        self.assertInvalid(choices=['Yes', 5])
+
+    def test_ballot_type_not_text(self):
+        """A ballot_type that is not a text is invalid."""
+        self.assertInvalid(ballot_type=['ranked'])
+
+    def test_external_id_not_scalar(self):
+        """An external_id that is neither a text nor a number is invalid."""
+        self.assertInvalid(external_id={'id': 1})
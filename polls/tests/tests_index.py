@@ -1,10 +1,13 @@
 """Test cases for index view."""
 
 import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
-from polls.models import Question
+from polls import cache as polls_cache
+from polls.models import Question, Vote
 
 
 # Create your tests here.
@@ -27,21 +30,25 @@ def create_question(question_text, days):
 class QuestionIndexViewTests(TestCase):
     """A Question index page tests."""
 
+    def setUp(self):
+        cache.clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse('polls:index'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "No polls are available.")
-        self.assertQuerysetEqual(response.context['latest_question_list'], [])
+        self.assertQuerySetEqual(response.context['latest_question_list'], [])
 
     def test_past_question(self):
         """Questions with a pub_date in the past are\
             displayed on the index page."""
         create_question(question_text="Past question.", days=-30)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question.>']
+            ['<Question: Past question.>'],
+            transform=repr
         )
 
     def test_future_question(self):
@@ -50,7 +57,7 @@ class QuestionIndexViewTests(TestCase):
         create_question(question_text="Future question.", days=30)
         response = self.client.get(reverse('polls:index'))
         self.assertContains(response, "No polls are available.")
-        self.assertQuerysetEqual(response.context['latest_question_list'], [])
+        self.assertQuerySetEqual(response.context['latest_question_list'], [])
 
     def test_future_question_and_past_question(self):
         """Even if both past and future questions exist,\
@@ -58,9 +65,10 @@ class QuestionIndexViewTests(TestCase):
         create_question(question_text="Past question.", days=-30)
         create_question(question_text="Future question.", days=30)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question.>']
+            ['<Question: Past question.>'],
+            transform=repr
         )
 
     def test_two_past_questions(self):
@@ -68,9 +76,99 @@ class QuestionIndexViewTests(TestCase):
         create_question(question_text="Past question 1.", days=-30)
         create_question(question_text="Past question 2.", days=-5)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question 2.>', '<Question: Past question 1.>']
+            ['<Question: Past question 2.>', '<Question: Past question 1.>'],
+            transform=repr
         )
 
 
+class QuestionIndexPaginationTests(TestCase):
+    """A Question index page pagination and status filter tests."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_keyset_pages(self):
+        """Following next_cursor walks through every question exactly once."""
+        for i in range(45):
+            create_question(question_text="Question {}.".format(i), days=-1 - i)
+        seen = []
+        url = reverse('polls:index')
+        while url:
+            response = self.client.get(url)
+            page = response.context['latest_question_list']
+            self.assertLessEqual(len(page), 20)
+            seen.extend(question.question_text for question in page)
+            cursor = response.context['next_cursor']
+            url = cursor and reverse('polls:index') + '?cursor=' + cursor
+        self.assertEqual(seen, ["Question {}.".format(i) for i in range(45)])
+
+    def test_page_query_count(self):
+        """A page costs one query however many questions exist."""
+        for i in range(25):
+            create_question(question_text="Question {}.".format(i), days=-1 - i)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('polls:index'))
+
+    def test_invalid_cursor(self):
+        """A cursor that was not made by the index page is not found."""
+        response = self.client.get(reverse('polls:index') + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_status_filters(self):
+        """?status= keeps only open, closed or upcoming questions."""
+        now = timezone.now()
+        Question.objects.create(question_text="Open.", pub_date=now - datetime.timedelta(days=1),
+                                end_date=now + datetime.timedelta(days=1))
+        Question.objects.create(question_text="Closed.", pub_date=now - datetime.timedelta(days=2),
+                                end_date=now - datetime.timedelta(days=1))
+        Question.objects.create(question_text="Upcoming.", pub_date=now + datetime.timedelta(days=1),
+                                end_date=now + datetime.timedelta(days=2))
+        for status, expected in (('open', 'Open.'), ('closed', 'Closed.'), ('upcoming', 'Upcoming.')):
+            response = self.client.get(reverse('polls:index'), {'status': status})
+            page = response.context['latest_question_list']
+            self.assertEqual([(question.question_text, question.status) for question in page],
+                             [(expected, status)])
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual(len(response.context['latest_question_list']), 2)
+
+
+class QuestionIndexVotedTests(TestCase):
+    """A Question index page tests for the choices of the logged in user."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('voter')
+        self.client.force_login(self.user)
+
+    def test_voted_in_one_query(self):
+        """The choices of the user on every question of the page are read in one query."""
+        questions = [create_question(question_text="Question {}.".format(i), days=-1 - i) for i in range(20)]
+        for question in questions[:3]:
+            Vote.objects.record(question, self.user, question.choice_set.create(choice_text='Yes'))
+        self.client.get(reverse('polls:index'))
+        polls_cache.bump(polls_cache.voted_version_key(self.user.pk))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('polls:index'))
+        voted = {question.pk: question.voted_choice_id for question in response.context['latest_question_list']}
+        self.assertEqual({pk for pk, choice_id in voted.items() if choice_id},
+                         {question.pk for question in questions[:3]})
+        self.assertContains(response, '(you voted)', count=3)
+
+    def test_vote_refreshes_voted(self):
+        """A new vote shows on the cached page at once."""
+        question = create_question(question_text="Voted question.", days=-1)
+        self.assertNotContains(self.client.get(reverse('polls:index')), '(you voted)')
+        Vote.objects.record(question, self.user, question.choice_set.create(choice_text='Yes'))
+        self.assertContains(self.client.get(reverse('polls:index')), '(you voted)')
+
+    def test_voted_not_shared(self):
+        """The cached page does not carry the choices of one user to another."""
+        question = create_question(question_text="Voted question.", days=-1)
+        Vote.objects.record(question, self.user, question.choice_set.create(choice_text='Yes'))
+        self.assertContains(self.client.get(reverse('polls:index')), '(you voted)')
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse('polls:index')), '(you voted)')
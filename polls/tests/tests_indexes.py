@@ -0,0 +1,44 @@
+"""Test cases for the query plans of the hot queries."""
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.utils import timezone
+
+from polls.models import Question, Vote
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Checks the SQLite EXPLAIN QUERY PLAN output.')
+class QueryPlanTests(TestCase):
+    """The hot queries search an index instead of scanning a table."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('Miko')
+        self.question = Question.objects.create(question_text='Indexed question.',
+                                                pub_date=timezone.now(), end_date=timezone.now())
+
+    def assertUsesIndex(self, queryset, index=None):
+        plan = queryset.explain()
+        self.assertNotIn('SCAN', plan)
+        self.assertIn(index or 'INDEX', plan)
+
+    def test_vote_by_question_and_user(self):
+        """The vote of a user on a question is found through the unique constraint."""
+        self.assertUsesIndex(Vote.objects.filter(question=self.question, user=self.user))
+
+    def test_votes_grouped_by_choice(self):
+        """Counting the votes of a question per choice reads only the covering index."""
+        queryset = Vote.objects.filter(question=self.question).values('choice').annotate(n=Count('pk'))
+        self.assertUsesIndex(queryset, 'COVERING INDEX polls_vote_question_choice_idx')
+
+    def test_votes_of_choice(self):
+        """The votes of a choice are found through an index."""
+        self.assertUsesIndex(Vote.objects.filter(choice__pk=1))
+
+    def test_published_questions(self):
+        """The index page query searches and orders by the pub_date index."""
+        queryset = Question.objects.filter(pub_date__lte=timezone.now()).order_by('-pub_date')
+        self.assertUsesIndex(queryset, 'polls_question_pub_end_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
@@ -0,0 +1,41 @@
+"""Test cases for the request metrics."""
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls import metrics
+
+
+class RequestMetricsTests(TestCase):
+    """A request metrics middleware and page tests."""
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_histograms_per_view(self):
+        """Every request is counted in the histograms of its view."""
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:index'))
+        text = metrics.render()
+        self.assertIn('polls_request_duration_seconds_count{view="polls:index"} 2', text)
+        self.assertIn('polls_request_db_queries_bucket{view="polls:index",le="+Inf"} 2', text)
+
+    @override_settings(POLLS_SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        """A request above the slow threshold is logged as a JSON line."""
+        with self.assertLogs('polls.middleware', 'WARNING') as logs:
+            self.client.get(reverse('polls:index'))
+        self.assertIn('"view": "polls:index"', logs.output[0])
+        self.assertIn('"db_queries": ', logs.output[0])
+
+    def test_metrics_page_staff_only(self):
+        """Only staff members can read the metrics page."""
+        User.objects.create_user('Miko', password='Himitsu')
+        self.client.login(username='Miko', password='Himitsu')
+        self.assertEqual(self.client.get(reverse('polls:metrics')).status_code, 302)
+        User.objects.create_user('Admin', password='Himitsu', is_staff=True)
+        self.client.login(username='Admin', password='Himitsu')
+        response = self.client.get(reverse('polls:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '# TYPE polls_request_duration_seconds histogram')
+        self.assertContains(response, 'polls_cache_hits_total')
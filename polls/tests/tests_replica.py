@@ -0,0 +1,128 @@
+"""Test cases for the routing of reads to the read replicas."""
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import db
+from polls.middleware import PrimaryStickinessMiddleware
+from polls.models import Question, Vote
+
+
+@override_settings(POLLS_DATABASE_REPLICAS=['replica1'])
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    """A primary/replica database router tests, outside the transaction of TestCase."""
+
+    def test_reads_go_to_replica(self):
+        """Reads go to a replica and writes to the primary."""
+        self.assertEqual(router.db_for_read(Question), 'replica1')
+        self.assertEqual(router.db_for_write(Vote), 'default')
+
+    def test_no_replica(self):
+        """Without replicas every read goes to the primary."""
+        with override_settings(POLLS_DATABASE_REPLICAS=[]):
+            self.assertEqual(router.db_for_read(Question), 'default')
+
+    def test_use_primary(self):
+        """Reads made in use_primary() go to the primary."""
+        with db.use_primary():
+            self.assertEqual(router.db_for_read(Question), 'default')
+        self.assertEqual(router.db_for_read(Question), 'replica1')
+
+    def test_transaction_reads_primary(self):
+        """Reads made in a transaction see its writes."""
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Question), 'default')
+
+    def test_migrate_primary_only(self):
+        """Only the primary is migrated."""
+        self.assertTrue(router.allow_migrate('default', 'polls'))
+        self.assertFalse(router.allow_migrate('replica1', 'polls'))
+
+
+@override_settings(POLLS_DATABASE_REPLICAS=['replica1'])
+class CachedReadYourWritesTests(TransactionTestCase):
+    """A read-your-writes through the versioned cache tests."""
+
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.question = Question.objects.create(question_text='Replicated question.',
+                                                pub_date=now - datetime.timedelta(days=1),
+                                                end_date=now + datetime.timedelta(days=1))
+        self.choice = self.question.choice_set.create(choice_text='First')
+        self.user = User.objects.create_user('Miko', password='Himitsu')
+        self.routed = []
+        route = db.PrimaryReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            # Record where the polls data would be read; the test database has no replica.
+            if model._meta.app_label == 'polls':
+                self.routed.append(route(router, model, **hints))
+            return 'default'
+
+        patcher = mock.patch.object(db.PrimaryReplicaRouter, 'db_for_read', db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def vote_then_results(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        self.assertIn('polls_primary', self.client.cookies)
+        url = reverse('polls:results', args=(self.question.id,))
+        self.routed.clear()
+        Client().get(url)
+        reader = self.routed[:]
+        self.routed.clear()
+        self.client.get(url)
+        return reader, self.routed
+
+    def test_vote_then_results(self):
+        """Results cached from a replica right after a vote are not served to the voter, who reads the primary."""
+        reader, voter = self.vote_then_results()
+        self.assertEqual(set(reader), {'replica1'})
+        self.assertTrue(voter)
+        self.assertEqual(set(voter), {'default'})
+
+    @override_settings(POLLS_REPLICA_PIN_SECONDS=0)
+    def test_replicas_caught_up(self):
+        """Once the replicas have caught up, the results cached from a replica are served to everyone."""
+        reader, voter = self.vote_then_results()
+        self.assertEqual(set(reader), {'replica1'})
+        self.assertEqual(voter, [])
+
+
+@override_settings(POLLS_DATABASE_REPLICAS=['replica1'], POLLS_REPLICA_PIN_SECONDS=5)
+class PrimaryStickinessMiddlewareTests(SimpleTestCase):
+    """A read-your-writes middleware tests."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = PrimaryStickinessMiddleware(self.read)
+
+    def read(self, request):
+        return HttpResponse(router.db_for_read(Question))
+
+    def test_get_reads_replica(self):
+        """A plain page view reads from a replica and sets no cookie."""
+        response = self.middleware(self.factory.get('/polls/'))
+        self.assertEqual(response.content, b'replica1')
+        self.assertNotIn('polls_primary', response.cookies)
+
+    def test_post_pins_primary(self):
+        """A write reads from the primary and pins the next reads of the browser."""
+        response = self.middleware(self.factory.post('/polls/1/vote/'))
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(response.cookies['polls_primary']['max-age'], 5)
+
+    def test_pinned_get_reads_primary(self):
+        """The page a voter is redirected to is read from the primary."""
+        request = self.factory.get('/polls/1/results/')
+        request.COOKIES['polls_primary'] = '1'
+        self.assertEqual(self.middleware(request).content, b'default')
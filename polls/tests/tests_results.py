@@ -0,0 +1,84 @@
+"""Test cases for results view."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published).
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + abs(datetime.timedelta(days=days))
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class QuestionResultsViewTests(TestCase):
+    """A Question results page tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(question_text='Results question.', days=-5)
+        self.choices = [self.question.choice_set.create(choice_text='Choice {}'.format(i))
+                        for i in range(30)]
+        for i in range(4):
+            user = User.objects.create_user('voter{}'.format(i), password='Himitsu')
+            Vote.objects.create(question=self.question, user=user,
+                                choice=self.choices[0] if i < 3 else self.choices[1])
+        Question.objects.recount_votes()
+        self.question.refresh_from_db()
+
+    def test_tally(self):
+        """tally() returns the vote count and percentage of every choice and the total."""
+        choices, total = self.question.tally()
+        self.assertEqual(total, 4)
+        self.assertEqual(len(choices), 30)
+        self.assertEqual((choices[0].vote_count, choices[0].percentage), (3, 75.0))
+        self.assertEqual((choices[1].vote_count, choices[1].percentage), (1, 25.0))
+        self.assertEqual((choices[2].vote_count, choices[2].percentage), (0, 0))
+
+    def test_tally_without_votes(self):
+        """A question without votes has a total of zero and no division error."""
+        question = create_question(question_text='Empty question.', days=-5)
+        question.choice_set.create(choice_text='Lonely')
+        choices, total = question.tally()
+        self.assertEqual(total, 0)
+        self.assertEqual(choices[0].percentage, 0)
+
+    def test_counters_match_votes(self):
+        """The vote counters of the choices match their Vote rows."""
+        counted = self.question.choice_set.annotate(num_votes=Count('vote')).order_by('pk')
+        self.assertEqual([choice.num_votes for choice in counted[:3]], [3, 1, 0])
+        self.assertEqual([choice.vote_count for choice in counted], [choice.num_votes for choice in counted])
+
+    def test_results_query_count(self):
+        """The results page costs the same number of queries for any number of choices."""
+        url = reverse('polls:results', args=(self.question.id,))
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, '75.0%')
+        self.assertEqual(response.context['total_votes'], 4)
+
+    def test_results_cached(self):
+        """A second visit is served from the cache until a vote changes the tally."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        user = User.objects.create_user('late')
+        Vote.objects.record(self.question, user, self.choices[1])
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_votes'], 5)
+        self.assertContains(response, '40.0%')
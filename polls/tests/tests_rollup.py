@@ -0,0 +1,100 @@
+"""Test cases for the hourly vote rollup and the timeline."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import rollup
+from polls.models import Question, Vote, VoteRollup
+
+UTC = datetime.timezone.utc
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class VoteRollupTests(TestCase):
+    """A vote rollup and timeline tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(question_text='Rolled up question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.hour = datetime.datetime(2024, 5, 1, 9, tzinfo=UTC)
+        self.after = self.hour + datetime.timedelta(days=1)
+
+    def vote(self, username, choice, minutes):
+        """Record a vote cast ``minutes`` after self.hour."""
+        vote, _ = Vote.objects.record(self.question, User.objects.create_user(username), choice)
+        at = self.hour + datetime.timedelta(minutes=minutes)
+        Vote.objects.filter(pk=vote.pk).update(created_at=at, updated_at=at)
+        return vote
+
+    def rows(self):
+        return list(VoteRollup.objects.order_by('bucket_hour', 'choice').values_list(
+            'bucket_hour', 'choice_id', 'count'))
+
+    def test_hourly_counts(self):
+        """The votes are counted by choice and hour."""
+        self.vote('a', self.first, 5)
+        self.vote('b', self.first, 50)
+        self.vote('c', self.second, 70)
+        self.assertEqual(rollup.roll_up(self.after), 2)
+        next_hour = self.hour + datetime.timedelta(hours=1)
+        self.assertEqual(self.rows(), [(self.hour, self.first.pk, 2), (next_hour, self.second.pk, 1)])
+
+    def test_incremental(self):
+        """A run only recounts the hours of the votes changed since the last one."""
+        self.vote('a', self.first, 5)
+        vote = self.vote('b', self.first, 70)
+        rollup.roll_up(self.after)
+        self.assertEqual(rollup.roll_up(self.after + datetime.timedelta(hours=1)), 0)
+        Vote.objects.record(self.question, vote.user, self.second)
+        self.assertEqual(rollup.roll_up(timezone.now()), 1)
+        next_hour = self.hour + datetime.timedelta(hours=1)
+        self.assertEqual(self.rows(), [(self.hour, self.first.pk, 1), (next_hour, self.second.pk, 1)])
+
+    def test_lag(self):
+        """Votes changed after the end of a run are left for the next one."""
+        self.vote('a', self.first, 5)
+        rollup.roll_up(self.hour)
+        self.assertEqual(self.rows(), [])
+        rollup.roll_up(self.after)
+        self.assertEqual(self.rows(), [(self.hour, self.first.pk, 1)])
+
+    def test_timeline(self):
+        """The timeline lists the counts of every rolled up hour in one query."""
+        self.vote('a', self.first, 5)
+        self.vote('b', self.second, 10)
+        self.vote('c', self.second, 130)
+        rollup.roll_up(self.after)
+        url = reverse('polls:results_timeline', args=(self.question.id,))
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            data = self.client.get(url).json()
+        self.assertEqual([choice['choice_text'] for choice in data['choices']], ['First', 'Second'])
+        self.assertEqual([(point['votes'], point['total']) for point in data['timeline']],
+                         [([1, 1], 2), ([0, 1], 1)])
+        data = self.client.get(url, {'since': '2024-05-01T10:00:00+00:00'}).json()
+        self.assertEqual([point['total'] for point in data['timeline']], [1])
+
+    def test_timeline_bad_since(self):
+        """An unreadable bound is a bad request."""
+        url = reverse('polls:results_timeline', args=(self.question.id,))
+        self.assertEqual(self.client.get(url, {'since': 'yesterday'}).status_code, 400)
@@ -0,0 +1,74 @@
+"""Test cases for the cached session and user of authenticated requests."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import auth
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class AuthenticatedPathTests(TestCase):
+    """An authenticated request path tests."""
+
+    def setUp(self):
+        cache.clear()
+        auth.clear()
+        self.question = create_question(question_text='Session question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.user = User.objects.create_user('Miko', password='Himitsu')
+        self.client.login(username='Miko', password='Himitsu')
+        self.vote_url = reverse('polls:vote', args=(self.question.id,))
+        # Warm the session, user and question caches.
+        self.client.get(reverse('polls:detail', args=(self.question.id,)))
+
+    def test_cached_page_without_queries(self):
+        """A cached page needs no query for the session or the user."""
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_vote_queries_only_to_record(self):
+        """An authenticated vote runs the queries of Vote.objects.record() and nothing else."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.vote_url, {'choice': self.first.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse([query for query in sql if 'django_session' in query or 'auth_user' in query], sql)
+        self.assertFalse([query for query in sql if query.startswith('SELECT') and 'polls_vote' not in query], sql)
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.first)
+
+    def test_password_change_logs_out(self):
+        """Changing the password ends the sessions started with the old one."""
+        self.user.set_password('Atarashii')
+        self.user.save()
+        response = self.client.post(self.vote_url, {'choice': self.first.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/accounts/login/', response.url)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_logout_forgets_user(self):
+        """Logging out drops the user from the user cache."""
+        self.client.get(reverse('polls:logout'))
+        self.assertEqual(auth._users, {})
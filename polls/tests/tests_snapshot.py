@@ -0,0 +1,94 @@
+"""Test cases for the result snapshots of closed polls."""
+import datetime
+import io
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question, ResultSnapshot, Vote, VoteArchive
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class ClosePollsTests(TestCase):
+    """A close_polls command tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(question_text='Closed question.', days=-20)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        for i, choice in enumerate([self.first, self.first, self.second]):
+            Vote.objects.record(self.question, User.objects.create_user('voter{}'.format(i)), choice)
+        # Closed after the votes were cast.
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(days=1))
+
+    def close_polls(self, *args):
+        out = io.StringIO()
+        call_command('close_polls', *args, stdout=out)
+        return out.getvalue()
+
+    def test_snapshot_closed_only(self):
+        """Only closed polls get a snapshot, with the exact vote counts."""
+        open_question = create_question(question_text='Open question.', days=-1)
+        self.close_polls()
+        self.assertFalse(ResultSnapshot.objects.filter(question=open_question).exists())
+        snapshot = ResultSnapshot.objects.get(question=self.question)
+        self.assertEqual(snapshot.total_votes, 3)
+        self.assertEqual([choice['votes'] for choice in snapshot.choices], [2, 1])
+
+    def test_results_from_snapshot(self):
+        """Once the votes are archived the results page is served from the snapshot in one query."""
+        self.close_polls('--archive', 'table')
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(VoteArchive.objects.filter(question_id=self.question.pk).count(), 3)
+        Choice.objects.filter(question=self.question).update(vote_count=0)
+        question = Question.objects.get(pk=self.question.pk)
+        with self.assertNumQueries(1):
+            choices, total = question.results()
+        self.assertEqual(([choice.vote_count for choice in choices], total), ([2, 1], 3))
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, 'First')
+        self.assertEqual([choice.vote_count for choice in response.context['choices']], [2, 1])
+
+    def test_recount_keeps_archived_counts(self):
+        """Recounting votes does not zero the counters of polls whose votes were archived."""
+        self.close_polls('--archive', 'table')
+        call_command('recount_votes', stdout=io.StringIO())
+        self.first.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.question.total_votes), (2, 3))
+
+    def test_archive_file(self):
+        """The votes are written as CSV before they are deleted."""
+        with tempfile.TemporaryDirectory() as directory:
+            self.close_polls('--archive', 'file', '--archive-dir', directory)
+            lines = (Path(directory) / 'question-{}.csv'.format(self.question.pk)).read_text().splitlines()
+        self.assertEqual(lines[0], 'id,question_id,choice_id,user_id')
+        self.assertEqual(len(lines), 4)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_rerun_idempotent(self):
+        """Polls closed before are skipped."""
+        self.assertIn('Closed 1 question(s), archived 3 vote(s).', self.close_polls('--archive', 'table'))
+        self.assertIn('Closed 0 question(s), archived 0 vote(s).', self.close_polls('--archive', 'table'))
+        self.assertEqual(VoteArchive.objects.count(), 3)
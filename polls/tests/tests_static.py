@@ -0,0 +1,72 @@
+"""Test cases for the template loaders and the collected static files."""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from django.core.management import call_command
+from django.template import engines
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+
+from polls.middleware import brotli
+
+HASHED_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+
+class TemplateLoaderTests(SimpleTestCase):
+    """A template loader tests."""
+
+    def test_cached_loader(self):
+        """Templates are found once in each directory and cached."""
+        engine = engines['django'].engine
+        self.assertEqual(len(engine.dirs), len(set(map(os.path.realpath, engine.dirs))))
+        loader, = engine.template_loaders
+        self.assertEqual(type(loader).__module__, 'django.template.loaders.cached')
+        self.assertIs(loader.get_template('polls/detail.html'), loader.get_template('polls/detail.html'))
+
+
+class StaticFilesTests(SimpleTestCase):
+    """A collected static files tests, with the hashed storage of the settings."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def hashed(self, **options):
+        return override_settings(STATIC_ROOT=self.root, STORAGES=HASHED_STORAGES, **options)
+
+    def test_missing_manifest_fails(self):
+        """Without collectstatic, pages fail instead of linking files that are not served."""
+        with self.hashed(), self.assertRaises(ValueError):
+            static('polls/style.css')
+
+    def test_plain_name_in_debug(self):
+        """With DEBUG on the files keep their plain names, as runserver serves them."""
+        with self.hashed(DEBUG=True):
+            self.assertEqual(static('polls/style.css'), '/static/polls/style.css')
+
+    def test_hashed_and_precompressed(self):
+        """collectstatic hashes the names, and the hashed files are served compressed and immutable."""
+        with self.hashed():
+            call_command('collectstatic', interactive=False, verbosity=0, stdout=io.StringIO())
+            self.assertRegex(static('polls/style.css'), r'^/static/polls/style\.[0-9a-f]{12}\.css$')
+            # Files too small to gain from compression, as style.css, have no variants.
+            url = static('admin/css/base.css')
+            self.assertTrue(os.path.exists(os.path.join(self.root, url[len('/static/'):] + '.gz')))
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=315360000', response['Cache-Control'])
+
+    @unittest.skipUnless(brotli, 'brotli is not installed')
+    def test_brotli(self):
+        """Clients accepting brotli get the .br variant."""
+        with self.hashed():
+            call_command('collectstatic', interactive=False, verbosity=0, stdout=io.StringIO())
+            response = self.client.get(static('admin/css/base.css'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
@@ -0,0 +1,159 @@
+"""Test cases for the live results stream."""
+import asyncio
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache as default_cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import cache, stream
+from polls.models import Question, Vote
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+def parse(chunk):
+    """Return the event name and data of one streamed event, or None for a heartbeat."""
+    fields = dict(line.split(': ', 1) for line in chunk.decode().splitlines() if line and not line.startswith(':'))
+    if 'event' not in fields:
+        return None
+    return fields['event'], json.loads(fields['data'])
+
+
+@override_settings(POLLS_STREAM_HEARTBEAT_SECONDS=60)
+class ResultsStreamTests(TestCase):
+    """A live results stream tests."""
+
+    def setUp(self):
+        default_cache.clear()
+        self.question = create_question(question_text='Live question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.user = User.objects.create_user('Miko')
+        self.url = reverse('polls:results_stream', args=(self.question.id,))
+
+    def vote(self, choice):
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.record(self.question, self.user, choice)
+
+    async def next_event(self, content):
+        return await asyncio.wait_for(content.__anext__(), 5)
+
+    async def test_snapshot_then_delta(self):
+        """The stream starts with the tally and then sends the counts a vote changed."""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        try:
+            event, data = parse(await self.next_event(content))
+            self.assertEqual(event, 'snapshot')
+            self.assertEqual([choice['votes'] for choice in data['choices']], [0, 0])
+            await sync_to_async(self.vote)(self.second)
+            self.assertEqual(parse(await self.next_event(content)),
+                             ('delta', {'total_votes': 1, 'choices': [{'id': self.second.id, 'votes': 1}]}))
+        finally:
+            await content.aclose()
+
+    async def test_one_tally_for_all_watchers(self):
+        """A vote is tallied once however many clients watch the question."""
+        contents = [(await self.async_client.get(self.url)).streaming_content for _ in range(3)]
+        try:
+            for content in contents:
+                await self.next_event(content)
+            before = cache.stats()['misses']
+            await sync_to_async(self.vote)(self.first)
+            for content in contents:
+                self.assertEqual(parse(await self.next_event(content))[0], 'delta')
+            self.assertEqual(cache.stats()['misses'] - before, 1)
+        finally:
+            for content in contents:
+                await content.aclose()
+
+    @override_settings(POLLS_STREAM_HEARTBEAT_SECONDS=0.05)
+    async def test_heartbeat(self):
+        """An idle stream sends a comment line every heartbeat."""
+        content = (await self.async_client.get(self.url)).streaming_content
+        try:
+            await self.next_event(content)
+            self.assertEqual(await self.next_event(content), stream.HEARTBEAT.encode())
+        finally:
+            await content.aclose()
+
+    @override_settings(POLLS_STREAM_MAX_CLIENTS=1)
+    async def test_client_cap(self):
+        """Watchers over the cap are told to come back later."""
+        content = (await self.async_client.get(self.url)).streaming_content
+        try:
+            await self.next_event(content)
+            response = await self.async_client.get(self.url)
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response)
+        finally:
+            await content.aclose()
+
+    @override_settings(POLLS_STREAM_MAX_CLIENTS=1)
+    async def test_unread_stream_takes_no_slot(self):
+        """A stream that is never read does not count against the cap."""
+        unread = (await self.async_client.get(self.url)).streaming_content
+        content = (await self.async_client.get(self.url)).streaming_content
+        try:
+            self.assertEqual(parse(await self.next_event(content))[0], 'snapshot')
+        finally:
+            await unread.aclose()
+            await content.aclose()
+
+    async def test_closed_poll_not_streamed(self):
+        """The results of a closed poll never change, so the browser is told not to reconnect."""
+        await Question.objects.filter(pk=self.question.pk).aupdate(
+            end_date=timezone.now() - datetime.timedelta(hours=1))
+        await sync_to_async(default_cache.clear)()
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 204)
+
+    @override_settings(POLLS_STREAM_QUEUE_SIZE=2)
+    async def test_slow_watcher_resynced(self):
+        """A watcher that falls behind gets one fresh snapshot instead of its backlog."""
+        broadcaster, queue = stream.subscribe(self.question)
+        try:
+            await broadcaster.ready
+            for i in range(3):
+                broadcaster.publish(stream.format_event('delta', {'n': i}))
+            self.assertEqual(queue.qsize(), 1)
+            self.assertEqual(queue.get_nowait(), broadcaster.snapshot)
+        finally:
+            stream.unsubscribe(broadcaster, queue)
+
+    def test_wsgi_not_streamed(self):
+        """Under WSGI the results page does not open the stream and the stream stops the browser."""
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertFalse(response.context['live_results'])
+        self.assertNotContains(response, 'EventSource')
+
+    async def test_asgi_results_page_streams(self):
+        """Under ASGI the results page of an open poll opens the stream."""
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, 'EventSource')
+
+    def test_unpublished_question(self):
+        """The stream of a question not published yet is not found."""
+        future = create_question(question_text='Future question.', days=5)
+        response = self.client.get(reverse('polls:results_stream', args=(future.id,)))
+        self.assertEqual(response.status_code, 404)
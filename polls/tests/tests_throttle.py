@@ -0,0 +1,83 @@
+"""Test cases for the login throttle and the cost of signup."""
+from unittest import mock
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from polls import throttle
+
+
+class SignupTests(TestCase):
+    """A signup cost tests."""
+
+    def test_signup_hashes_once(self):
+        """Signing up hashes the password once and logs the new user in."""
+        with mock.patch.object(PBKDF2PasswordHasher, 'encode', autospec=True,
+                               side_effect=PBKDF2PasswordHasher.encode) as encode, self.assertLogs('polls.views'):
+            self.client.post(reverse('polls:signup'), {
+                'username': 'Miko', 'email': 'miko@example.com',
+                'password1': 'Kakushigoto-42', 'password2': 'Kakushigoto-42'})
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(int(self.client.session['_auth_user_id']), User.objects.get(username='Miko').pk)
+
+
+class LoginThrottleTests(TestCase):
+    """A login throttle tests."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('Miko', password='Himitsu')
+
+    def login(self, password='Wrong', username='Miko', ip='10.0.0.1'):
+        with self.assertLogs('polls.views'):
+            return self.client.post(reverse('polls:login'), {'username': username, 'password': password},
+                                    REMOTE_ADDR=ip)
+
+    @override_settings(POLLS_LOGIN_THROTTLES={'username': (2, 60)})
+    def test_username_throttled_before_hashing(self):
+        """Attempts over the limit of a username are rejected without hashing a password."""
+        self.assertEqual(self.login(ip='10.0.0.1').status_code, 200)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 200)
+        with mock.patch('polls.views.authenticate') as authenticate:
+            response = self.login(password='Himitsu', ip='10.0.0.3')
+        authenticate.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertContains(response, 'Too many attempts', status_code=429)
+
+    @override_settings(POLLS_LOGIN_THROTTLES={'ip': (1, 60)})
+    def test_ip_throttled(self):
+        """An address over its limit is rejected while other addresses may still log in."""
+        self.login(ip='10.0.0.1')
+        self.assertEqual(self.login(password='Himitsu', ip='10.0.0.1').status_code, 429)
+        self.assertRedirects(self.login(password='Himitsu', ip='10.0.0.2'), reverse('polls:index'))
+
+    def test_bucket_refills(self):
+        """A bucket gets its tokens back over its period."""
+        bucket = throttle.TokenBucket('test', 2, 60)
+        with mock.patch('polls.throttle.time.time', return_value=1000):
+            self.assertEqual([bucket.take('a'), bucket.take('a')], [0, 0])
+            self.assertEqual(bucket.take('a'), 30)
+            self.assertEqual(bucket.take('b'), 0)
+        with mock.patch('polls.throttle.time.time', return_value=1030):
+            self.assertEqual(bucket.take('a'), 0)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """A throttle cache deployment check tests."""
+
+    def test_locmem_warns(self):
+        """The deployment checks warn when the throttles are kept in LocMemCache."""
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            ids = [message.id for message in run_checks(include_deployment_checks=True)]
+        self.assertIn('polls.W001', ids)
+
+    def test_shared_cache(self):
+        """A shared cache passes the check."""
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}}):
+            self.assertEqual(throttle.check_shared_cache(None), [])
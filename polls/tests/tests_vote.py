@@ -0,0 +1,123 @@
+"""Test cases for vote view."""
+import datetime
+import threading
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question, Vote
+
+
+def create_question(question_text, days, duration=10):
+    """
+    Create a question with the given `question_text` and published the.
+
+    given number of `days` offset to now (negative for questions published
+    in the past, positive for questions that have yet to be published),
+    open for voting during `duration` days.
+    """
+    time = timezone.now() + datetime.timedelta(days=days)
+    end = time + datetime.timedelta(days=duration)
+
+    return (Question.objects.create(
+        question_text=question_text, pub_date=time, end_date=end))
+
+
+class VoteViewTests(TestCase):
+    """A vote view tests."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('Miko', password='Himitsu')
+        self.client.login(username='Miko', password='Himitsu')
+        self.question = create_question(question_text='Vote question.', days=-5)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+
+    def vote(self, choice, question=None):
+        question = question or self.question
+        return self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+
+    def assertCounts(self, first, second, total):
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count, self.question.total_votes),
+                         (first, second, total))
+
+    def test_new_vote_increments_counters(self):
+        """A first vote increments its choice and the question total."""
+        response = self.vote(self.first)
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.assertCounts(1, 0, 1)
+
+    def test_switching_vote_moves_counter(self):
+        """Changing the vote moves one count from the old choice to the new one."""
+        self.vote(self.first)
+        self.vote(self.second)
+        self.assertCounts(0, 1, 1)
+        self.assertEqual(Vote.objects.get(question=self.question, user=self.user).choice, self.second)
+
+    def test_same_vote_twice(self):
+        """Voting for the same choice again changes nothing."""
+        self.vote(self.first)
+        self.vote(self.first)
+        self.assertCounts(1, 0, 1)
+
+    def test_closed_question(self):
+        """A vote on a closed question is refused and counts nothing."""
+        closed = create_question(question_text='Closed question.', days=-5, duration=1)
+        choice = closed.choice_set.create(choice_text='Late')
+        response = self.vote(choice, question=closed)
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertFalse(Vote.objects.filter(question=closed).exists())
+
+    def test_recount_votes_command(self):
+        """recount_votes repairs counters that drifted from the Vote table."""
+        self.vote(self.first)
+        Choice.objects.update(vote_count=42)
+        Question.objects.update(total_votes=42)
+        call_command('recount_votes', stdout=StringIO())
+        self.assertCounts(1, 0, 1)
+
+
+class ConcurrentVoteTests(TransactionTestCase):
+    """Parallel vote submissions tests."""
+
+    def test_parallel_votes(self):
+        """Parallel POSTs of the same users leave one vote each and exact counters."""
+        question = create_question(question_text='Busy question.', days=-5)
+        choices = [question.choice_set.create(choice_text='Choice {}'.format(i)) for i in range(3)]
+        users = [User.objects.create_user('voter{}'.format(i)) for i in range(4)]
+        errors = []
+
+        def submit(user, choice):
+            client = Client()
+            client.force_login(user)
+            try:
+                for _ in range(5):
+                    response = client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+                    if response.status_code != 302:
+                        errors.append(response.status_code)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(user, choice)) for user in users for choice in choices]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Vote.objects.filter(question=question).count(), len(users))
+        question.refresh_from_db()
+        self.assertEqual(question.total_votes, len(users))
+        counted = {choice.pk: choice.num_votes for choice in question.choice_set.annotate(num_votes=Count('vote'))}
+        self.assertEqual({choice.pk: choice.vote_count for choice in question.choice_set.all()}, counted)
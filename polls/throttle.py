@@ -0,0 +1,92 @@
+"""Token-bucket throttles kept in the cache."""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+
+class TokenBucket:
+    """
+    A bucket of ``capacity`` tokens per identity, refilled at ``capacity`` per ``period`` seconds.
+
+    Every attempt takes a token, and attempts that find the bucket empty
+    are rejected. The buckets live in the default cache, so the processes
+    only share them when CACHE_URL is a shared cache (Redis, memcached or a
+    file cache on one host): with the default LocMemCache each of N worker
+    processes has its own buckets and the limits are N times looser, which
+    ``manage.py check --deploy`` warns about. Concurrent attempts may both
+    take the last token, which only lets a burst through by a few attempts.
+    """
+
+    def __init__(self, scope, capacity, period):
+        """Create the throttle named ``scope``."""
+        self.scope = scope
+        self.capacity = capacity
+        self.period = period
+
+    def key(self, identity):
+        """Return the cache key of the bucket of ``identity``."""
+        return 'polls:throttle:{}:{}'.format(self.scope, hashlib.md5(identity.encode()).hexdigest())
+
+    def take(self, identity):
+        """
+        Take a token from the bucket of ``identity``.
+
+        Returns:
+            float: 0 if a token was taken, else the seconds until the next
+            token is available.
+        """
+        key = self.key(identity)
+        now = time.time()
+        tokens, updated = cache.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.capacity / self.period)
+        if tokens < 1:
+            cache.set(key, (tokens, now), self.period)
+            return (1 - tokens) * self.period / self.capacity
+        cache.set(key, (tokens - 1, now), self.period)
+        return 0
+
+    def reset(self, identity):
+        """Fill the bucket of ``identity`` again."""
+        cache.delete(self.key(identity))
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when the login throttles are kept in a cache of each process."""
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.POLLS_LOGIN_THROTTLES and backend == 'django.core.cache.backends.locmem.LocMemCache':
+        return [checks.Warning(
+            'The login throttles are kept in LocMemCache, which is not shared between processes.',
+            hint='Each worker process has its own buckets, so the limits are as many times looser; '
+                 'set CACHE_URL to a shared cache such as Redis or memcached.',
+            id='polls.W001',
+        )]
+    return []
+
+
+def login_throttles():
+    """Return the throttles of POLLS_LOGIN_THROTTLES by scope, 'ip' and 'username'."""
+    return {scope: TokenBucket('login-' + scope, capacity, period)
+            for scope, (capacity, period) in settings.POLLS_LOGIN_THROTTLES.items()}
+
+
+def check_login(request, username=None):
+    """
+    Take a login token of the client's IP address, then of ``username`` if one is given.
+
+    The IP address is checked first, so a client over its limit is
+    rejected without taking the tokens of the username it tries.
+
+    Returns:
+        float: 0 if the attempt may go on, else the seconds to wait.
+    """
+    throttles = login_throttles()
+    identities = [('ip', request.META.get('REMOTE_ADDR', '')), ('username', (username or '').lower())]
+    for scope, identity in identities:
+        if scope in throttles and identity:
+            wait = throttles[scope].take(identity)
+            if wait:
+                return wait
+    return 0
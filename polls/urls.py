@@ -1,15 +1,26 @@
 """A configuration of urls site."""
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# Under ASGI (see mysite/asgi.py) the read and vote pages are async views.
+pages = async_views if settings.POLLS_ASYNC_VIEWS else views
 
 app_name = 'polls'
 urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    path('<int:pk>/', views.DetailView.as_view(), name='detail'),
-    path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote'),
+    path('', pages.IndexView.as_view(), name='index'),
+    path('<int:pk>/', pages.DetailView.as_view(), name='detail'),
+    path('<int:pk>/results/', pages.ResultsView.as_view(), name='results'),
+    path('<int:pk>/results/stream', async_views.results_stream, name='results_stream'),
+    path('<int:pk>/results/timeline', api.question_timeline, name='results_timeline'),
+    path('<int:question_id>/vote/', pages.vote, name='vote'),
     path('login/', views.login_page, name='login'),
     path('logout/', views.logout_page, name='logout'),
-    path('signup/', views.signup, name='signup')
+    path('signup/', views.signup, name='signup'),
+    path('api/questions/', api.QuestionListView.as_view(), name='api_questions'),
+    path('api/questions/<int:pk>/', api.question_detail, name='api_question'),
+    path('api/questions/<int:pk>/results/', api.question_results, name='api_results'),
+    path('export/', views.export_page, name='export'),
+    path('_metrics', views.metrics_page, name='metrics'),
 ]
@@ -1,30 +1,50 @@
 """A configuration of view for poll sites."""
+import base64
+import datetime
 import logging
+import math
 
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
-from django.shortcuts import get_object_or_404, render, redirect
-from django.http import HttpResponseRedirect
+from django.shortcuts import render, redirect
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, StreamingHttpResponse
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.views import generic
 from django.utils import timezone
 from django.contrib import messages
 
 from polls.forms import CreateUserForm
-from .models import Choice, Question, Vote
+from . import buffer, cache, export, metrics, throttle
+from .models import Ballot, BallotType, Question, Vote
 
 # Create your views here.
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-formatter = logging.Formatter('%(asctime)s: &(name)s:%(message)s')
 
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(formatter)
+def encode_cursor(question):
+    """Encode the position of a question in the index as an opaque cursor."""
+    position = '{}|{}'.format(question.pub_date.isoformat(), question.pk)
+    return base64.urlsafe_b64encode(position.encode()).decode()
 
-logger.addHandler(stream_handler)
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor.
+
+    Returns:
+        tuple: The publication date and primary key of the question.
+
+    Raises:
+        ValueError: If the cursor is not a valid one.
+    """
+    pub_date, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.datetime.fromisoformat(pub_date), int(pk)
 
 
 class IndexView(generic.ListView):
@@ -32,16 +52,84 @@ class IndexView(generic.ListView):
 
     template_name = 'polls/index.html'
     context_object_name = 'latest_question_list'
+    page_size = 20
+    statuses = ('open', 'closed', 'upcoming')
+
+    def page_queryset(self):
+        """
+        Return the questions of the requested page and the first one of the next page.
+
+        Only published questions are listed unless ``?status=upcoming`` asks
+        for them. ``?status=open`` and ``?status=closed`` keep only the
+        questions open or closed for voting, and ``?cursor=`` continues after
+        the last question of a previous page.
+        """
+        now = timezone.now()
+        self.status = self.request.GET.get('status')
+        questions = Question.objects.with_status(now).order_by('-pub_date', '-pk')
+        if self.status in self.statuses:
+            questions = questions.filter_status(self.status, now)
+        else:
+            self.status = None
+            questions = questions.filter(pub_date__lte=now)
+        self.cursor = self.request.GET.get('cursor')
+        if self.cursor:
+            try:
+                questions = questions.after(*decode_cursor(self.cursor))
+            except ValueError:
+                raise Http404("Invalid cursor.")
+        return questions[:self.page_size + 1]
+
+    def paginate(self, questions):
+        """Split the questions of page_queryset() into the page and the cursor of the next page."""
+        if len(questions) > self.page_size:
+            return questions[:self.page_size], encode_cursor(questions[self.page_size - 1])
+        return questions, None
 
     def get_queryset(self):
         """
-        Return the last five published questions.
+        Return one page of published questions, newest first.
 
         (not including those set to be published in the future).
         """
-        return Question.objects.filter(
-            pub_date__lte=timezone.now()
-        ).order_by('-pub_date')
+        questions = self.page_queryset()
+        page, self.next_cursor = cache.get_question_page(
+            self.status, self.cursor, lambda: self.paginate(list(questions)))
+        return page
+
+    def get_voted(self, questions):
+        """Return the ids of the choices of the user by question id, for the questions of the page."""
+        return cache.get_voted(self.request.user, questions)
+
+    def get_context_data(self, **kwargs):
+        """Add the cursor of the next page, the status filter and the choices of the user."""
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        context['status'] = self.status
+        voted = self.get_voted(self.object_list)
+        for question in self.object_list:
+            # The page is a copy read from the cache, so this never leaks to other users.
+            question.voted_choice_ids = voted.get(question.pk, [])
+            question.voted_choice_id = question.voted_choice_ids[0] if question.voted_choice_ids else None
+        return context
+
+
+def vote_form_context(choices, voted_choice_ids):
+    """
+    Return the context of the vote form of polls/detail.html.
+
+    Args:
+        choices: The choices of the question.
+        voted_choice_ids: The ids of the choices of the user, in order of
+            preference for ranked questions.
+    """
+    return {
+        'choices': choices,
+        'voted_choice_ids': voted_choice_ids,
+        'voted_choice_id': voted_choice_ids[0] if voted_choice_ids else None,
+        # The choice preselected in each rank of a ranked form.
+        'ranks': (list(voted_choice_ids) + [None] * len(choices))[:len(choices)],
+    }
 
 
 class DetailView(generic.DetailView):
@@ -50,9 +138,32 @@ class DetailView(generic.DetailView):
     model = Question
     template_name = 'polls/detail.html'
 
-    def get_queryset(self):
-        """Excludes any questions that aren't published yet."""
-        return Question.objects.filter(pub_date__lte=timezone.now())
+    def get_object(self, queryset=None):
+        """Return the cached question, excluding any questions that aren't published yet."""
+        return self.unpack(cache.get_question(self.kwargs['pk']))
+
+    def unpack(self, payload):
+        """Return the question of a cached payload and keep its choices."""
+        if payload is None or not payload[0].is_published():
+            raise Http404("No question found matching the query")
+        question, self.choices = payload
+        return question
+
+    def get_voted(self):
+        """Return the ids of the choices of the user by question id, for this question."""
+        return cache.get_voted(self.request.user, [self.object])
+
+    def get_context_data(self, **kwargs):
+        """Add the cached choices of the question and the current choices of the user."""
+        context = super().get_context_data(**kwargs)
+        context.update(vote_form_context(self.choices, self.get_voted().get(self.object.pk, [])))
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        """Let the browser reuse the page briefly; it is private, as it shows the choice of the user."""
+        response = super().render_to_response(context, **response_kwargs)
+        patch_cache_control(response, private=True, max_age=settings.POLLS_OPEN_POLL_MAX_AGE)
+        return response
 
 
 class ResultsView(generic.DetailView):
@@ -61,19 +172,68 @@ class ResultsView(generic.DetailView):
     model = Question
     template_name = 'polls/results.html'
 
+    def get_object(self, queryset=None):
+        """Return the cached question."""
+        payload = cache.get_question(self.kwargs['pk'])
+        if payload is None:
+            raise Http404("No question found matching the query")
+        return payload[0]
+
+    def get_tally(self):
+        """Return the cached tally of the question."""
+        return cache.get_tally(self.object)
+
+    def get_context_data(self, **kwargs):
+        """Add the precomputed tally so the template never queries, and whether to stream it."""
+        context = super().get_context_data(**kwargs)
+        context['choices'], context['total_votes'] = self.get_tally()
+        # Only ASGI streams the results; under WSGI the page would poll the stream instead.
+        context['live_results'] = self.object.can_vote() and isinstance(self.request, ASGIRequest)
+        return context
+
+    def get_cache_control(self):
+        """
+        Return the Cache-Control directives of the results page.
+
+        The results of open polls change with every vote and are cached
+        briefly, those frozen by close_polls never change again. Closed polls
+        without a snapshot may still be recounted.
+        """
+        if self.object.end_date > timezone.now():
+            return {'max_age': settings.POLLS_OPEN_POLL_MAX_AGE}
+        if self.object.is_frozen():
+            return {'public': True, 'max_age': settings.POLLS_FROZEN_RESULTS_MAX_AGE, 'immutable': True}
+        return {'public': True, 'max_age': settings.POLLS_API_CLOSED_MAX_AGE}
+
+    def render_to_response(self, context, **response_kwargs):
+        """Render the results with the headers of get_cache_control()."""
+        response = super().render_to_response(context, **response_kwargs)
+        patch_cache_control(response, **self.get_cache_control())
+        return response
+
+
+def _throttled(request, template, form, wait):
+    """Render ``template`` with 429 Too Many Requests, before any password is hashed."""
+    logger.warning("Throttled: {} from {}".format(request.path, request.META.get('REMOTE_ADDR')))
+    messages.error(request, 'Too many attempts, try again in {} seconds.'.format(math.ceil(wait)))
+    response = render(request, template, {'form': form}, status=429)
+    response['Retry-After'] = math.ceil(wait)
+    return response
+
 
 def signup(request):
     """Register a new user."""
     if request.method == 'POST':
         form = CreateUserForm(request.POST)
+        wait = throttle.check_login(request)
+        if wait:
+            return _throttled(request, 'registration/signup.html', form, wait)
         if form.is_valid():
-            form.save()
-            username = form.cleaned_data.get('username')
-            raw_passwd = form.cleaned_data.get('password1')
-            user = authenticate(username=username, password=raw_passwd)
-            login(request, user)
-            logger.info("Login Attempt: Unsuccessful login as {} at {}".format(request.POST['username'],
-                                                                               request.META.get('REMOTE_ADDR')))
+            # The form hashed the password once already; log the new user in
+            # without authenticating, which would hash it again.
+            user = form.save()
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+            logger.info("Signup: {} at {}".format(user.username, request.META.get('REMOTE_ADDR')))
             return redirect('polls:login')
         # what if form is not valid?
         # we should display a message in signup.html
@@ -92,6 +252,9 @@ def login_page(request):
         username = request.POST.get("username")
         password = request.POST.get("password")
 
+        wait = throttle.check_login(request, username)
+        if wait:
+            return _throttled(request, 'registration/login.html', AuthenticationForm(), wait)
         user = authenticate(request, username=username, password=password)
         if user is not None:
             login(request, user)
@@ -112,29 +275,56 @@ def logout_page(request):
     return redirect('polls:login')
 
 
+def selected_choices(question, choices, data):
+    """
+    Return the choices of a submitted vote form, read from its ``choice`` fields.
+
+    Plurality questions take one choice, approval questions any number of
+    them and ranked questions a list in order of preference, where blank
+    ranks are skipped.
+
+    Raises:
+        ValueError: With the message for the user if the choices are not valid.
+    """
+    by_id = {str(choice.pk): choice for choice in choices}
+    values = [value for value in data.getlist('choice') if value]
+    if question.ballot_type == BallotType.PLURALITY:
+        values = values[:1]
+    selected = [by_id.get(value) for value in values]
+    if not selected or None in selected:
+        raise ValueError("You didn't select a choice.")
+    if len(set(values)) != len(values):
+        raise ValueError("Each choice can only be ranked once.")
+    return selected
+
+
 @login_required
 def vote(request, question_id):
     """Do allowed users vote due to the conditions."""
-    question = get_object_or_404(Question, pk=question_id)
+    # The question and its choices come from the cache, so a vote only
+    # queries the database to record it.
+    payload = cache.get_question(question_id)
+    if payload is None:
+        raise Http404("No question found matching the query")
+    question, choices = payload
 
     if question.can_vote():
         try:
-            selected_choice = question.choice_set.get(pk=request.POST['choice'])
-        except (KeyError, Choice.DoesNotExist):
+            selected = selected_choices(question, choices, request.POST)
+        except ValueError as error:
             # Redisplay the question voting form.
             return render(request, 'polls/detail.html', {
                 'question': question,
-                'error_message': "You didn't select a choice.",
+                'error_message': str(error),
+                **vote_form_context(choices, []),
             })
         else:
-            in_vote = Vote.objects.filter(question=question_id, user=request.user).exists()
-            if in_vote:
-                voting = Vote.objects.get(user=request.user)
-                voting.choice_id = selected_choice.id
-                voting.save()
+            if question.ballot_type != BallotType.PLURALITY:
+                Ballot.objects.cast(question, request.user, selected)
+            elif settings.POLLS_VOTE_BUFFER:
+                buffer.get_buffer().add(question.pk, request.user.pk, selected[0].pk)
             else:
-                voting = Vote.objects.create(question=question, user=request.user, choice=selected_choice)
-                voting.save()
+                Vote.objects.record(question, request.user, selected[0])
             # Always return an HttpResponseRedirect after successfully dealing
             # with POST data. This prevents data from being posted twice if a
             # user hits the Back button.
@@ -142,4 +332,38 @@ def vote(request, question_id):
                 'polls:results', args=(question.id,)))
     else:
         messages.error(request, "This poll was not in the polling period.")
-        return redirect('poll:index')
+        return redirect('polls:index')
+
+
+@staff_member_required
+def metrics_page(request):
+    """Per-view request metrics in the Prometheus text format, for staff only."""
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def export_page(request):
+    """
+    Stream the votes, or the tallies with ``tallies=1``, as CSV or NDJSON, for staff only.
+
+    ``format`` is ``csv`` or ``ndjson`` and ``question`` (repeatable)
+    restricts the export to some questions. ``ballots=1`` exports the
+    ballots of the approval and ranked questions instead of the votes.
+    """
+    format = request.GET.get('format', 'csv')
+    if format not in export.FORMATS:
+        return HttpResponseBadRequest("Unknown format.")
+    try:
+        question_ids = [int(pk) for pk in request.GET.getlist('question')]
+    except ValueError:
+        return HttpResponseBadRequest("Invalid question id.")
+    tallies = request.GET.get('tallies') == '1'
+    ballots = not tallies and request.GET.get('ballots') == '1'
+    # Under ASGI a synchronous iterator would be read whole before it is sent.
+    lines = export.alines if isinstance(request, ASGIRequest) else export.lines
+    response = StreamingHttpResponse(lines(format, question_ids, tallies, ballots=ballots),
+                                     content_type=export.FORMATS[format].content_type)
+    filename = '{}{}.{}'.format('tallies' if tallies else 'ballots' if ballots else 'votes',
+                                ''.join('-{}'.format(pk) for pk in question_ids), export.FORMATS[format].extension)
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response